@@ -0,0 +1,589 @@
+#!/usr/bin/env python3
+"""
+Performance benchmarks for the Browser Use MCP server, with a JSON report and
+regression thresholds.
+
+Drives the REAL MagusBrowserServer (the same handlers, metrics, pools and
+shutdown path that ship) and times what users wait on:
+
+  startup_cold       `python3 mcp-server.py` to its `initialize` answer, first
+                     start (no tool catalog yet: browser_use is imported)
+  startup            the same, every later start (catalog hit)
+  tools_list         tools/list over the SDK's in-memory transport
+  first_launch       _init_browser_session(): Chromium start + profile (--live)
+  evaluate           browser_evaluate round trip
+  evaluate_concurrent  8 browser_evaluate calls at once, wall time
+  keyboard           browser_keyboard, 100 keys in one call
+  cookie_import_500  the cookie half of browser_import_session: 500 cookies
+  shutdown_sync      _shutdown_sync() with --sessions browsers to kill
+  reap_orphans       _reap_orphaned_profiles() over --profiles dead profiles
+
+Two modes:
+
+  fake (default, CI)  The page is fake_cdp_server.py, a local CDP websocket
+                      endpoint with no browser behind it, so the numbers are
+                      this server's own overhead (framing and JSON included),
+                      not Chromium's. --cdp-latency-ms and --payload-bytes
+                      shape its replies. Browsers to kill are real child
+                      processes.
+  --live              Real headless Chromium on manual-verify/monaco-page.html,
+                      served from a local HTTP server.
+
+Everything runs under a throwaway HOME, so the real ~/.config/browseruse is
+never touched. Each benchmark reports its median, p95, min and max over
+--rounds timed runs (after warm-up runs where they make sense). A run fails
+(exit 1) when a median exceeds its budget for the mode (BUDGETS_MS; fake
+runs with latency or payload injected have none), or, with --baseline, when it
+is more than --tolerance slower than the baseline report.
+
+Run:
+    python3 bench_mcp_server.py --report bench.json
+    python3 bench_mcp_server.py --baseline bench.json          # compare
+    python3 bench_mcp_server.py --cdp-latency-ms 5 --payload-bytes 65536
+    python3 bench_mcp_server.py --live --report live.json      # real Chromium
+
+Needs `browser-use` and `mcp` installed; --live also needs a Chromium
+(`browser_doctor` reports both).
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import http.server
+import importlib.util
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+_SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+_SERVER_PATH = _SCRIPTS_DIR / "mcp-server.py"
+_FIXTURE_DIR = _SCRIPTS_DIR / "manual-verify"
+_FIXTURE_PAGE = "monaco-page.html"
+
+REPORT_FORMAT = "magus-bench/1"
+
+# Median budgets in ms, per mode: a median above its budget fails the run.
+# Several times what a laptop measures, so they catch an order-of-magnitude
+# regression on any CI box, not noise; --baseline is the fine-grained check.
+BUDGETS_MS = {
+    "fake": {
+        "startup_cold": 15000,
+        "startup": 3000,
+        "tools_list": 10,
+        "evaluate": 5,
+        "evaluate_concurrent": 20,
+        "keyboard": 50,
+        "cookie_import_500": 20,
+        "shutdown_sync": 3000,
+        "reap_orphans": 5000,
+    },
+    "live": {
+        "startup_cold": 15000,
+        "startup": 3000,
+        "tools_list": 10,
+        "first_launch": 15000,
+        "evaluate": 100,
+        "evaluate_concurrent": 500,
+        "keyboard": 2000,
+        "cookie_import_500": 500,
+        "shutdown_sync": 10000,
+        "reap_orphans": 5000,
+    },
+}
+
+# A baseline comparison ignores differences below this: sub-millisecond
+# medians move by more than any tolerance from scheduling noise alone.
+_NOISE_FLOOR_MS = 0.5
+
+# Fake-mode settings that change what the numbers mean.
+_FAKE_CDP_SETTINGS = ("cdp_latency_ms", "payload_bytes")
+
+_KEYBOARD_KEYS = 100
+_CONCURRENT_CALLS = 8
+_COOKIES = 500
+
+
+# ---------------------------------------------------------------------------
+# Measurement
+# ---------------------------------------------------------------------------
+
+def _stats(samples_ms: list[float], **extra: Any) -> dict[str, Any]:
+    """median / p95 / min / max of `samples_ms`, plus any extra fields."""
+    ordered = sorted(samples_ms)
+    p95 = ordered[min(len(ordered) - 1, max(0, round(0.95 * len(ordered)) - 1))]
+    return {
+        "rounds": len(ordered),
+        "median_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(p95, 3),
+        "min_ms": round(ordered[0], 3),
+        "max_ms": round(ordered[-1], 3),
+        **extra,
+    }
+
+
+async def _time_async(fn: Any, rounds: int, warmup: int = 0) -> list[float]:
+    for _ in range(warmup):
+        await fn()
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _load_server() -> Any:
+    spec = importlib.util.spec_from_file_location("mcp_server_bench", _SERVER_PATH)
+    mod = importlib.util.module_from_spec(spec)
+    sys.modules["mcp_server_bench"] = mod
+    spec.loader.exec_module(mod)
+    return mod
+
+
+# ---------------------------------------------------------------------------
+# Fake CDP: a page behind fake_cdp_server.py
+# ---------------------------------------------------------------------------
+
+class _FakeBrowser:
+    """
+    The BrowserSession surface the live-page tools use, over a real cdp_use
+    CDPClient connected to a FakeCDPServer — so the server's own CDP path
+    (send.Domain.method, the metrics wrapper, the websocket) runs as it does
+    for real.
+    """
+
+    def __init__(self, client: Any) -> None:
+        from fake_cdp_server import PAGE_TARGET_ID
+
+        session_id = f"FAKE-SESSION-{PAGE_TARGET_ID}"
+        self.id = "fake-browser"
+        self.agent_focus_target_id = PAGE_TARGET_ID
+        self.session_manager = SimpleNamespace(_target_sessions={PAGE_TARGET_ID: {session_id}})
+        self._cdp_session = SimpleNamespace(
+            cdp_client=client, session_id=session_id, target_id=PAGE_TARGET_ID
+        )
+
+    async def get_or_create_cdp_session(self, target_id: Any = None, focus: bool = False) -> Any:
+        return self._cdp_session
+
+
+class _ChildBrowser:
+    """A browser to kill at shutdown: a real child process behind a session's handles."""
+
+    def __init__(self, index: int) -> None:
+        import psutil
+
+        self.child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(600)"])
+        self.id = f"child-browser-{index}"
+        self._local_browser_watchdog = SimpleNamespace(_subprocess=psutil.Process(self.child.pid))
+
+    async def kill(self) -> None:
+        # Upstream's kill() ends the browser and waits for it to exit.
+        self.child.terminate()
+        await asyncio.to_thread(self.child.wait)
+
+
+# ---------------------------------------------------------------------------
+# Benchmarks
+# ---------------------------------------------------------------------------
+
+def _start_and_initialize(env: dict[str, str]) -> float:
+    """ms from spawning the server to its `initialize` answer."""
+    request = {
+        "jsonrpc": "2.0",
+        "id": 1,
+        "method": "initialize",
+        "params": {
+            "protocolVersion": "2025-06-18",
+            "capabilities": {},
+            "clientInfo": {"name": "bench", "version": "1"},
+        },
+    }
+    started = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, str(_SERVER_PATH)],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        env=env,
+    )
+    try:
+        proc.stdin.write((json.dumps(request) + "\n").encode())
+        proc.stdin.flush()
+        reply = json.loads(proc.stdout.readline())
+        elapsed = (time.perf_counter() - started) * 1000
+        if "result" not in reply:
+            raise RuntimeError(f"initialize failed: {reply}")
+        return elapsed
+    finally:
+        proc.stdin.close()  # The server exits when its stdin closes.
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+def bench_startup(args: argparse.Namespace) -> dict[str, dict[str, Any]]:
+    env = dict(os.environ)
+    cold = _start_and_initialize(env)
+    warm = [_start_and_initialize(env) for _ in range(max(1, min(args.rounds, 10)))]
+    return {"startup_cold": _stats([cold]), "startup": _stats(warm)}
+
+
+async def bench_tools_list(mod: Any, args: argparse.Namespace) -> dict[str, Any]:
+    from mcp.shared.memory import create_connected_server_and_client_session
+
+    server = mod.MagusBrowserServer()
+    async with create_connected_server_and_client_session(server.server) as client:
+        tools = len((await client.list_tools()).tools)
+        samples = await _time_async(client.list_tools, args.rounds, warmup=3)
+    return _stats(samples, tools=tools)
+
+
+async def bench_page_tools(
+    mod: Any, server: Any, args: argparse.Namespace, cdp: Any = None
+) -> dict[str, Any]:
+    """evaluate, keyboard and cookie import against server.browser_session."""
+    results: dict[str, Any] = {}
+
+    async def evaluate() -> None:
+        out = await server._execute_tool("browser_evaluate", {"script": "return 1 + 1"})
+        if out.startswith("Error") or '"result"' not in out:
+            raise RuntimeError(f"browser_evaluate: {out}")
+
+    results["evaluate"] = _stats(await _time_async(evaluate, args.rounds, warmup=3))
+
+    async def evaluate_concurrent() -> None:
+        await asyncio.gather(*(evaluate() for _ in range(_CONCURRENT_CALLS)))
+
+    if cdp is not None:
+        cdp.reset_counters()
+    samples = await _time_async(evaluate_concurrent, max(1, args.rounds // 5), warmup=1)
+    extra: dict[str, Any] = {"calls": _CONCURRENT_CALLS}
+    if cdp is not None:
+        # 1 here means the calls went to the page one at a time.
+        extra["max_in_flight"] = cdp.max_in_flight
+    results["evaluate_concurrent"] = _stats(samples, **extra)
+
+    if args.live:
+        await server._execute_tool("browser_focus", {"selector": "#plain"})
+    keys = ["a"] * _KEYBOARD_KEYS
+
+    async def keyboard() -> None:
+        out = await server._execute_tool("browser_keyboard", {"keys": keys})
+        if out.startswith("Error"):
+            raise RuntimeError(f"browser_keyboard: {out}")
+
+    samples = await _time_async(keyboard, max(1, args.rounds // 5), warmup=1)
+    median_s = statistics.median(samples) / 1000
+    results["keyboard"] = _stats(
+        samples, keys=_KEYBOARD_KEYS, keys_per_second=round(_KEYBOARD_KEYS / median_s)
+    )
+
+    cdp_session = await server._live_cdp_session()
+    domain = "127.0.0.1" if args.live else "bench.example"
+    cookies = [
+        {"name": f"c{i}", "value": "v" * 32, "domain": domain, "path": "/",
+         "expires": time.time() + 86400, "httpOnly": False, "secure": False}
+        for i in range(_COOKIES)
+    ]
+
+    async def cookie_import() -> None:
+        failures = await server._set_cookies(cdp_session, cookies)
+        if failures:
+            raise RuntimeError(f"cookie import: {failures[:3]}")
+
+    results["cookie_import_500"] = _stats(
+        await _time_async(cookie_import, max(1, args.rounds // 5), warmup=1), cookies=_COOKIES
+    )
+    return results
+
+
+async def run_fake_page(mod: Any, args: argparse.Namespace) -> dict[str, Any]:
+    from cdp_use.client import CDPClient
+    from fake_cdp_server import FakeCDPServer
+
+    cdp = FakeCDPServer(latency=args.cdp_latency_ms / 1000, payload_bytes=args.payload_bytes)
+    async with cdp:
+        client = CDPClient(cdp.ws_url)
+        await client.start()
+        try:
+            server = mod.MagusBrowserServer()
+            server.browser_session = _FakeBrowser(client)
+            return await bench_page_tools(mod, server, args, cdp)
+        finally:
+            await client.stop()
+
+
+@contextlib.contextmanager
+def _fixture_server():
+    """The manual-verify pages over HTTP on a free local port."""
+
+    class Quiet(http.server.SimpleHTTPRequestHandler):
+        def __init__(self, *a: Any, **kw: Any) -> None:
+            super().__init__(*a, directory=str(_FIXTURE_DIR), **kw)
+
+        def log_message(self, *a: Any) -> None:
+            pass
+
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Quiet)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}/{_FIXTURE_PAGE}"
+    finally:
+        httpd.shutdown()
+
+
+async def run_live_page(mod: Any, args: argparse.Namespace, page_url: str) -> dict[str, Any]:
+    server = mod.MagusBrowserServer()
+    started = time.perf_counter()
+    await server._init_browser_session()
+    results: dict[str, Any] = {"first_launch": _stats([(time.perf_counter() - started) * 1000])}
+    try:
+        await server._execute_tool("browser_navigate", {"url": page_url})
+        for _ in range(50):
+            state = await server._execute_tool("browser_evaluate", {"script": "document.readyState"})
+            if "complete" in state:
+                break
+            await asyncio.sleep(0.1)
+        results.update(await bench_page_tools(mod, server, args))
+    finally:
+        await server._close_session(server.browser_session.id)
+    return results
+
+
+def bench_shutdown(mod: Any, args: argparse.Namespace) -> dict[str, Any]:
+    """_shutdown_sync with args.sessions browsers; from outside any event loop, as at exit."""
+    samples = []
+    rounds = 1 if args.live else max(1, min(args.rounds, 5))
+    for _ in range(rounds):
+        server = mod.MagusBrowserServer()
+        if args.live:
+            sessions = asyncio.run(_start_live_browsers(mod, server, args.sessions))
+        else:
+            sessions = [_ChildBrowser(i) for i in range(args.sessions)]
+        server.active_sessions = {
+            s.id: {"session": s, "created_at": time.time(), "last_activity": time.time()}
+            for s in sessions
+        }
+        started = time.perf_counter()
+        server._shutdown_sync()
+        samples.append((time.perf_counter() - started) * 1000)
+        for session in sessions:
+            child = getattr(session, "child", None)
+            if child is not None and child.poll() is None:
+                child.kill()
+                child.wait()
+    return _stats(samples, sessions=args.sessions)
+
+
+async def _start_live_browsers(mod: Any, server: Any, count: int) -> list[Any]:
+    sessions = [
+        server._create_pooled_browser(mod._session_profile_dir(os.getpid(), slot))
+        for slot in range(1, count + 1)
+    ]
+    await asyncio.gather(*(session.start() for session in sessions))
+    return sessions
+
+
+def bench_reaper(mod: Any, args: argparse.Namespace) -> dict[str, Any]:
+    """_reap_orphaned_profiles over args.profiles profiles of dead servers."""
+    import psutil
+
+    base = Path.home() / ".config" / "browseruse" / "profiles"
+    dead = []
+    pid = 4_194_304  # Linux's largest pid_max: never a live process.
+    while len(dead) < args.profiles:
+        pid += 1
+        if not psutil.pid_exists(pid):
+            dead.append(pid)
+    samples = []
+    for _ in range(max(1, min(args.rounds, 5))):
+        for dead_pid in dead:
+            profile = base / f"{mod._SESSION_PROFILE_PREFIX}{dead_pid}" / "Default"
+            profile.mkdir(parents=True, exist_ok=True)
+            (profile / "Cookies").write_bytes(b"x" * 4096)
+            (profile / "Preferences").write_text("{}")
+        started = time.perf_counter()
+        with contextlib.redirect_stderr(io.StringIO()):  # One line naming every profile.
+            mod._reap_orphaned_profiles(base)
+        samples.append((time.perf_counter() - started) * 1000)
+        left = [p for p in base.iterdir() if p.name.startswith(mod._SESSION_PROFILE_PREFIX)]
+        if left:
+            raise RuntimeError(f"reaper left {len(left)} orphaned profiles behind")
+    return _stats(samples, profiles=args.profiles)
+
+
+# ---------------------------------------------------------------------------
+# Report
+# ---------------------------------------------------------------------------
+
+def _environment() -> dict[str, Any]:
+    from importlib import metadata
+
+    versions = {}
+    for dist in ("browser-use", "mcp", "cdp-use"):
+        try:
+            versions[dist] = metadata.version(dist)
+        except metadata.PackageNotFoundError:
+            versions[dist] = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "packages": versions,
+        "server_sha256": hashlib.sha256(_SERVER_PATH.read_bytes()).hexdigest(),
+    }
+
+
+def check(report: dict[str, Any], baseline: dict[str, Any] | None, tolerance: float) -> None:
+    """Fill report["budget_failures"] and report["regressions"]."""
+    settings = report.get("settings", {})
+    shaped = any(settings.get(key) for key in _FAKE_CDP_SETTINGS)
+    # The fake-mode budgets assume an instant page; with latency or payload
+    # injected, only a baseline taken with the same settings says anything.
+    budgets = {} if shaped else BUDGETS_MS[report["mode"]]
+    report["budget_failures"] = [
+        {"benchmark": name, "median_ms": result["median_ms"], "budget_ms": budgets[name]}
+        for name, result in report["results"].items()
+        if name in budgets and result["median_ms"] > budgets[name]
+    ]
+    report["regressions"] = []
+    if baseline is None:
+        return
+    if baseline.get("mode") != report["mode"]:
+        raise SystemExit(f"baseline is a {baseline.get('mode')} run, this is {report['mode']}")
+    for key in _FAKE_CDP_SETTINGS:
+        theirs = baseline.get("settings", {}).get(key, 0)
+        if theirs != settings.get(key, 0):
+            raise SystemExit(f"baseline ran with {key}={theirs}, this run {settings.get(key, 0)}")
+    for name, result in report["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if before is None:
+            continue
+        limit = before["median_ms"] * (1 + tolerance) + _NOISE_FLOOR_MS
+        if result["median_ms"] > limit:
+            report["regressions"].append({
+                "benchmark": name,
+                "median_ms": result["median_ms"],
+                "baseline_ms": before["median_ms"],
+                "change": f"{result['median_ms'] / before['median_ms'] - 1:+.0%}"
+                if before["median_ms"] else None,
+            })
+
+
+def run(mod: Any, args: argparse.Namespace) -> dict[str, Any]:
+    only = set(args.only.split(",")) if args.only else None
+
+    def wanted(*names: str) -> bool:
+        return only is None or bool(only.intersection(names))
+
+    results: dict[str, Any] = {}
+    if wanted("startup", "startup_cold"):
+        results.update(bench_startup(args))
+    if wanted("tools_list"):
+        results["tools_list"] = asyncio.run(bench_tools_list(mod, args))
+    if wanted("first_launch", "evaluate", "evaluate_concurrent", "keyboard", "cookie_import_500"):
+        if args.live:
+            with _fixture_server() as page_url:
+                results.update(asyncio.run(run_live_page(mod, args, page_url)))
+        else:
+            results.update(asyncio.run(run_fake_page(mod, args)))
+    if wanted("shutdown_sync"):
+        results["shutdown_sync"] = bench_shutdown(mod, args)
+    if wanted("reap_orphans"):
+        results["reap_orphans"] = bench_reaper(mod, args)
+    if only is not None:
+        results = {name: result for name, result in results.items() if name in only}
+    return {
+        "format": REPORT_FORMAT,
+        "mode": "live" if args.live else "fake",
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": _environment(),
+        "settings": {
+            "rounds": args.rounds,
+            "sessions": args.sessions,
+            "profiles": args.profiles,
+            **({} if args.live else {
+                "cdp_latency_ms": args.cdp_latency_ms,
+                "payload_bytes": args.payload_bytes,
+            }),
+        },
+        "results": results,
+    }
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--live", action="store_true", help="real headless Chromium instead of fake CDP")
+    parser.add_argument("--rounds", type=int, default=50, help="timed runs per benchmark (default 50)")
+    parser.add_argument("--sessions", type=int, default=None,
+                        help="browsers killed by shutdown_sync (default 4 fake, 2 live)")
+    parser.add_argument("--profiles", type=int, default=200, help="orphaned profiles to reap (default 200)")
+    parser.add_argument("--cdp-latency-ms", type=float, default=0.0,
+                        help="fake mode: delay before each CDP reply (default 0)")
+    parser.add_argument("--payload-bytes", type=int, default=0,
+                        help="fake mode: size of each evaluation result (default 0)")
+    parser.add_argument("--only", help="comma-separated benchmark names")
+    parser.add_argument("--report", type=Path, help="write the JSON report here (default: stdout)")
+    parser.add_argument("--baseline", type=Path, help="a previous report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="slowdown vs --baseline that fails the run (default 0.25 = 25%%)")
+    args = parser.parse_args(argv)
+    if args.sessions is None:
+        args.sessions = 2 if args.live else 4
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+
+    # browser_use is imported lazily, on first use: after HOME is swapped.
+    mod = _load_server()
+    home = Path(tempfile.mkdtemp(prefix="magus-bench-home-"))
+    saved = {key: os.environ.get(key) for key in ("HOME", "PLAYWRIGHT_BROWSERS_PATH")}
+    try:
+        # The Chromium Playwright installed lives under the real HOME.
+        os.environ["PLAYWRIGHT_BROWSERS_PATH"] = str(mod._playwright_cache_root())
+        os.environ["HOME"] = str(home)
+        report = run(mod, args)
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        shutil.rmtree(home, ignore_errors=True)
+
+    check(report, baseline, args.tolerance)
+    text = json.dumps(report, indent=2)
+    if args.report:
+        args.report.write_text(text + "\n")
+    else:
+        print(text)
+
+    for name, result in report["results"].items():
+        print(f"{name:>19}: median {result['median_ms']:9.3f}ms  p95 {result['p95_ms']:9.3f}ms",
+              file=sys.stderr)
+    for failure in report["budget_failures"]:
+        print(f"OVER BUDGET {failure['benchmark']}: {failure['median_ms']}ms > "
+              f"{failure['budget_ms']}ms", file=sys.stderr)
+    for regression in report["regressions"]:
+        print(f"REGRESSION {regression['benchmark']}: {regression['median_ms']}ms vs "
+              f"{regression['baseline_ms']}ms ({regression['change']})", file=sys.stderr)
+    return 1 if report["budget_failures"] or report["regressions"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
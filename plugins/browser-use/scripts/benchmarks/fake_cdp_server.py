@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+"""
+A local fake CDP endpoint: a real WebSocket server that answers the Chrome
+DevTools Protocol commands this plugin sends, with no browser behind it.
+
+The unit tests stub CDP in-process (_FakeCDPClient / _FakeCDPSession), which
+skips everything between a handler and a browser: websocket framing, JSON
+encode and decode on both ends, cdp_use's reader task, and the event loop
+interleaving replies at real message rates. This server keeps all of that and
+removes only Chromium, so what is measured against it is the MCP server's own
+per-call overhead and concurrency behavior, free of browser variance.
+
+Answered:
+
+  Runtime.evaluate           a compiled function handle when an objectGroup
+                             is given (browser_evaluate's compile step),
+                             else a packed value (see --payload-bytes)
+  Runtime.callFunctionOn     a packed value
+  Runtime.release*           {}
+  Input.*                    {}
+  Network / Storage cookies  getCookies, getAllCookies, setCookie(s),
+                             deleteCookies, clear*Cookies on one shared jar
+  Target.*                   getTargets, createTarget, closeTarget,
+                             attachToTarget, getTargetInfo, activateTarget,
+                             setAutoAttach, setDiscoverTargets
+  Page.navigate              a frame and loader id
+  *.enable / *.disable       {}
+
+Anything else gets Chrome's own "wasn't found" error, so a tool that starts
+sending a new command fails loudly here rather than getting a plausible {}.
+
+Each reply waits `latency` seconds (or a per-method override) on its own
+task, so commands in flight overlap the way they do against a browser, and
+the server records the most it ever had in flight (`max_in_flight`): a tool
+that serializes calls which could overlap shows up as 1.
+
+Also answers GET /json/version and /json/list, so an http:// cdp_url works.
+
+Library use (what benchmarks/bench_mcp_server.py and the tests do):
+
+    async with FakeCDPServer(latency=0.002, payload_bytes=4096) as cdp:
+        client = CDPClient(cdp.ws_url)
+        await client.start()
+
+Standalone, for pointing other tools at:
+
+    python3 fake_cdp_server.py --port 9222 --latency-ms 2 --payload-bytes 4096 \\
+        --method-latency Input.dispatchKeyEvent=0.5
+
+Needs `websockets` (a browser-use dependency).
+"""
+
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+from typing import Any
+
+PAGE_TARGET_ID = "FAKE-PAGE-0"
+_BROWSER_PATH = "/devtools/browser/fake"
+
+
+class FakeCDPServer:
+    """
+    A CDP endpoint on `host`:`port` (0 picks a free port) answering every
+    command after `latency` seconds, or `method_latency[method]` where given.
+    Evaluation results carry a string of `payload_bytes` characters (0: the
+    number 2), so reply size can be scaled independently of latency.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        payload_bytes: int = 0,
+        method_latency: dict[str, float] | None = None,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.payload_bytes = payload_bytes
+        self.method_latency = dict(method_latency or {})
+        self.host = host
+        self.port = port
+        self.commands: collections.Counter[str] = collections.Counter()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.cookies: dict[tuple[str, str, str], dict[str, Any]] = {}
+        self.targets: dict[str, dict[str, Any]] = {}
+        self._ids = itertools.count(1)
+        self._server: Any = None
+        self._add_target(PAGE_TARGET_ID, "about:blank")
+
+    # -- lifecycle ----------------------------------------------------------
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.port}{_BROWSER_PATH}"
+
+    @property
+    def http_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self) -> "FakeCDPServer":
+        from websockets.asyncio.server import serve
+
+        # No per-message size cap: payload_bytes is the caller's to choose.
+        self._server = await serve(
+            self._connection, self.host, self.port,
+            process_request=self._http, max_size=None, compression=None,
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> "FakeCDPServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc: Any) -> None:
+        await self.stop()
+
+    def reset_counters(self) -> None:
+        self.commands.clear()
+        self.max_in_flight = self.in_flight
+
+    # -- transport ----------------------------------------------------------
+
+    def _http(self, connection: Any, request: Any) -> Any:
+        """The DevTools HTTP endpoints; None lets a websocket upgrade through."""
+        from websockets.datastructures import Headers
+        from websockets.http11 import Response
+
+        path = request.path.split("?")[0].rstrip("/")
+        if path == "/json/version":
+            body: Any = {
+                "Browser": "FakeCDP/1.0",
+                "Protocol-Version": "1.3",
+                "webSocketDebuggerUrl": self.ws_url,
+            }
+        elif path in ("/json", "/json/list"):
+            body = [
+                {**self._target_info(target_id), "id": target_id,
+                 "webSocketDebuggerUrl": f"ws://{self.host}:{self.port}/devtools/page/{target_id}"}
+                for target_id in self.targets
+            ]
+        else:
+            return None
+        data = json.dumps(body).encode()
+        headers = Headers([("Content-Type", "application/json"), ("Content-Length", str(len(data)))])
+        return Response(200, "OK", headers, data)
+
+    async def _connection(self, ws: Any) -> None:
+        tasks: set[asyncio.Task] = set()
+        try:
+            async for message in ws:
+                task = asyncio.create_task(self._answer(ws, json.loads(message)))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def _answer(self, ws: Any, request: dict[str, Any]) -> None:
+        from websockets.exceptions import ConnectionClosed
+
+        method = request.get("method", "")
+        self.commands[method] += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            delay = self.method_latency.get(method, self.latency)
+            if delay > 0:
+                await asyncio.sleep(delay)
+            reply: dict[str, Any] = {"id": request.get("id")}
+            try:
+                reply["result"] = self._reply(method, request.get("params") or {})
+            except LookupError as exc:
+                reply["error"] = {"code": -32601 if isinstance(exc, KeyError) else -32000,
+                                  "message": exc.args[0]}
+            if "sessionId" in request:
+                reply["sessionId"] = request["sessionId"]
+        finally:
+            self.in_flight -= 1
+        try:
+            await ws.send(json.dumps(reply))
+        except ConnectionClosed:
+            pass
+
+    # -- protocol -----------------------------------------------------------
+
+    def _reply(self, method: str, params: dict[str, Any]) -> dict[str, Any]:
+        """The result for one command. KeyError: unknown method; LookupError: bad params."""
+        domain, _, name = method.partition(".")
+        if name in ("enable", "disable"):
+            return {}
+
+        if method == "Runtime.evaluate" and "objectGroup" in params:
+            return {"result": {"type": "function", "className": "Function",
+                               "objectId": f"fake-fn-{next(self._ids)}"}}
+        if method in ("Runtime.evaluate", "Runtime.callFunctionOn"):
+            value = "x" * self.payload_bytes if self.payload_bytes else 2
+            return {"result": {"type": "object", "value": {"json": json.dumps(value)}}}
+        if method in ("Runtime.releaseObject", "Runtime.releaseObjectGroup", "Runtime.runIfWaitingForDebugger"):
+            return {}
+
+        if domain == "Input":
+            return {}
+
+        if method in ("Network.getCookies", "Network.getAllCookies", "Storage.getCookies"):
+            return {"cookies": list(self.cookies.values())}
+        if method == "Network.setCookie":
+            self._set_cookie(params)
+            return {"success": True}
+        if method in ("Network.setCookies", "Storage.setCookies"):
+            for cookie in params.get("cookies", []):
+                self._set_cookie(cookie)
+            return {}
+        if method == "Network.deleteCookies":
+            for key in [k for k in self.cookies if k[0] == params.get("name")]:
+                if params.get("domain") in (None, key[1]):
+                    del self.cookies[key]
+            return {}
+        if method in ("Network.clearBrowserCookies", "Storage.clearCookies"):
+            self.cookies.clear()
+            return {}
+
+        if method == "Target.getTargets":
+            return {"targetInfos": [self._target_info(t) for t in self.targets]}
+        if method == "Target.createTarget":
+            target_id = f"FAKE-PAGE-{next(self._ids)}"
+            self._add_target(target_id, params.get("url", "about:blank"))
+            return {"targetId": target_id}
+        if method == "Target.closeTarget":
+            return {"success": self.targets.pop(self._target(params), None) is not None}
+        if method == "Target.attachToTarget":
+            target_id = self._target(params)
+            self.targets[target_id]["attached"] = True
+            return {"sessionId": f"FAKE-SESSION-{target_id}"}
+        if method == "Target.getTargetInfo":
+            return {"targetInfo": self._target_info(self._target(params, default=PAGE_TARGET_ID))}
+        if method in ("Target.activateTarget", "Target.setAutoAttach",
+                      "Target.setDiscoverTargets", "Target.detachFromTarget"):
+            return {}
+
+        if method == "Page.navigate":
+            target = self.targets.get(PAGE_TARGET_ID)
+            if target is not None:
+                target["url"] = params.get("url", "")
+            return {"frameId": PAGE_TARGET_ID, "loaderId": f"fake-loader-{next(self._ids)}"}
+
+        raise KeyError(f"'{method}' wasn't found")
+
+    def _set_cookie(self, cookie: dict[str, Any]) -> None:
+        if "name" not in cookie:
+            raise LookupError("Invalid cookie fields")
+        domain = cookie.get("domain") or ""
+        path = cookie.get("path") or "/"
+        self.cookies[(cookie["name"], domain, path)] = {
+            "name": cookie["name"], "value": cookie.get("value", ""), "domain": domain,
+            "path": path, "expires": cookie.get("expires", -1), "size": 0,
+            "httpOnly": bool(cookie.get("httpOnly")), "secure": bool(cookie.get("secure")),
+            "session": cookie.get("expires", -1) == -1,
+        }
+
+    def _add_target(self, target_id: str, url: str) -> None:
+        self.targets[target_id] = {"url": url, "attached": False}
+
+    def _target(self, params: dict[str, Any], default: str | None = None) -> str:
+        target_id = params.get("targetId", default)
+        if target_id not in self.targets:
+            raise LookupError("No target with given id found")
+        return target_id
+
+    def _target_info(self, target_id: str) -> dict[str, Any]:
+        target = self.targets[target_id]
+        return {"targetId": target_id, "type": "page", "title": "", "url": target["url"],
+                "attached": target["attached"], "canAccessOpener": False,
+                "browserContextId": "FAKE-CONTEXT"}
+
+
+def _method_latency(spec: str) -> tuple[str, float]:
+    method, _, ms = spec.partition("=")
+    try:
+        return method, float(ms) / 1000
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected Domain.method=MS, got {spec!r}") from None
+
+
+async def _serve_forever(args: argparse.Namespace) -> None:
+    server = FakeCDPServer(
+        latency=args.latency_ms / 1000,
+        payload_bytes=args.payload_bytes,
+        method_latency=dict(args.method_latency),
+        host=args.host,
+        port=args.port,
+    )
+    async with server:
+        print(server.ws_url, flush=True)
+        await asyncio.Event().wait()
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 picks a free port (default)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay before every reply")
+    parser.add_argument("--payload-bytes", type=int, default=0, help="size of each evaluation result")
+    parser.add_argument("--method-latency", type=_method_latency, action="append", default=[],
+                        metavar="Domain.method=MS", help="per-method delay; repeatable")
+    args = parser.parse_args(argv)
+    try:
+        asyncio.run(_serve_forever(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
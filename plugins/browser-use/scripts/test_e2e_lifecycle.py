@@ -25,6 +25,13 @@ What is proven, against processes that really exist:
   6. That same reaper does NOT touch a browser owned by a LIVE server, including
      the PID-prefix case (`session-8173` must not reap `session-81735`), built
      from a real dead PID and a real live one rather than a patched process_iter.
+  7. Pipelined key dispatch delivers every key, in order, to a real page —
+     and reports keys/second against the one-reply-at-a-time mode.
+  8. A browser_evaluate result past the inline limit reaches its spill file
+     whole, pulled from the page in chunks.
+  9. A browser_run_script script with attach_browser drives the server's own
+     Chromium through Playwright's connect_over_cdp, in the tab opened for it,
+     and the browser outlives the script while that tab does not.
 
 Safety rules this file obeys, without exception:
   - No `pkill`, no `killall`, no name or pattern matching. Every process it
@@ -955,6 +962,152 @@ class TestReaperAgainstRealProcesses(unittest.TestCase):
         )
 
 
+# ---------------------------------------------------------------------------
+# Keyboard throughput against a real browser
+# ---------------------------------------------------------------------------
+
+# Logs every keydown the page receives, so arrival and order are countable.
+# Inline, so the benchmark stays offline.
+_KEY_LOG_PAGE = (
+    "data:text/html,<script>window.k=[];"
+    "addEventListener('keydown',e=>k.push(e.key))</script>"
+)
+
+
+@unittest.skipIf(_SKIP_REASON is not None, f"E2E unavailable: {_SKIP_REASON}")
+class TestKeyThroughputAgainstChromium(unittest.TestCase):
+    """
+    browser_press_key count=200 through a real server into headless Chromium,
+    pipelined (the default) and with BROWSER_USE_KEY_PIPELINE=0. Prints keys
+    per second for both, and checks that every key arrived, in order, either
+    way — the in-browser half of the guarantee the fake-CDP tests cover.
+    """
+
+    KEYS = 200
+
+    def _run(self, pipeline: str) -> tuple[float, str]:
+        home = _make_home()
+        self.addCleanup(shutil.rmtree, home, ignore_errors=True)
+        server = _Server(home, extra_env={"BROWSER_USE_KEY_PIPELINE": pipeline})
+        self.addCleanup(server.close)
+        server.initialize()
+        server.call_tool("browser_navigate", {"url": _KEY_LOG_PAGE})
+        server.call_tool("browser_press_key", {"key": "a"})  # warm the CDP session
+
+        started = time.perf_counter()
+        server.call_tool("browser_press_key", {"key": "b", "count": self.KEYS})
+        elapsed = time.perf_counter() - started
+        server.call_tool("browser_press_key", {"key": "Enter"})
+        value = server.call_tool("browser_evaluate", {"script": "window.k.join(',')"})
+        return self.KEYS / elapsed, value
+
+    def test_pipelined_keys_arrive_in_order_and_faster(self):
+        serial_rate, serial_value = self._run("0")
+        pipelined_rate, pipelined_value = self._run("1")
+
+        print(
+            f"\n[e2e] key dispatch into headless Chromium: serial {serial_rate:.0f} "
+            f"keys/s | pipelined {pipelined_rate:.0f} keys/s",
+            file=sys.stderr,
+        )
+        expected = ",".join(["a"] + ["b"] * self.KEYS + ["Enter"])
+        for value in (serial_value, pipelined_value):
+            self.assertIn(expected, value)
+        self.assertGreater(pipelined_rate, serial_rate)
+
+
+@unittest.skipIf(_SKIP_REASON is not None, f"E2E unavailable: {_SKIP_REASON}")
+class TestLargeEvaluateResultAgainstChromium(unittest.TestCase):
+    """
+    A 3M-character string out of headless Chromium: over the default inline
+    limit and three chunks long. The spill file must hold exactly its JSON,
+    and the page must have let go of it afterwards.
+    """
+
+    LENGTH = 3 * 1024 * 1024
+
+    def test_large_result_is_spilled_whole(self):
+        home = _make_home()
+        self.addCleanup(shutil.rmtree, home, ignore_errors=True)
+        server = _Server(home)
+        self.addCleanup(server.close)
+        server.initialize()
+        server.call_tool("browser_navigate", {"url": "data:text/html,<p>big</p>"})
+
+        started = time.perf_counter()
+        reply = json.loads(
+            server.call_tool(
+                "browser_evaluate",
+                {"script": f"'0123456789abcdef'.repeat({self.LENGTH // 16})"},
+            )
+        )
+        elapsed = time.perf_counter() - started
+        print(f"\n[e2e] {self.LENGTH} character result spilled in {elapsed:.2f}s", file=sys.stderr)
+
+        path = Path(reply["result_file"])
+        self.assertTrue(path.is_relative_to(home), path)
+        self.assertEqual(json.loads(path.read_text()), "0123456789abcdef" * (self.LENGTH // 16))
+        self.assertEqual(reply["length"], self.LENGTH + 2)
+        left = server.call_tool(
+            "browser_evaluate", {"script": "globalThis[Symbol.for('magus.evalResults')].size"}
+        )
+        self.assertEqual(json.loads(left), {"result": 0})
+
+
+_ATTACHED_SCRIPT = """
+import asyncio, os
+from playwright.async_api import async_playwright
+
+async def main():
+    async with async_playwright() as p:
+        browser = await p.chromium.connect_over_cdp(os.environ["BROWSER_USE_CDP_URL"])
+        for page in browser.contexts[0].pages:
+            cdp = await page.context.new_cdp_session(page)
+            info = await cdp.send("Target.getTargetInfo")
+            if info["targetInfo"]["targetId"] == os.environ["BROWSER_USE_TARGET_ID"]:
+                await page.goto("data:text/html,<title>attached-script</title>")
+                print(await page.title())
+        await browser.close()  # Over CDP this only disconnects.
+
+asyncio.run(main())
+"""
+
+
+@unittest.skipIf(_SKIP_REASON is not None, f"E2E unavailable: {_SKIP_REASON}")
+@unittest.skipUnless(importlib.util.find_spec("playwright"), "playwright not installed")
+class TestAttachedScriptAgainstChromium(unittest.TestCase):
+    """
+    attach_browser against the server's real Chromium: the script finds the
+    tab opened for it by target id and navigates it; afterwards the agent's
+    page still answers and the script's tab is gone.
+    """
+
+    def test_attached_script_drives_its_tab_of_the_live_browser(self):
+        home = _make_home()
+        self.addCleanup(shutil.rmtree, home, ignore_errors=True)
+        server = _Server(home)
+        self.addCleanup(server.close)
+        server.initialize()
+        server.call_tool("browser_navigate", {"url": "data:text/html,<title>agent-page</title>"})
+
+        script = home / "attached.py"
+        script.write_text(_ATTACHED_SCRIPT)
+        started = time.perf_counter()
+        reply = json.loads(
+            server.call_tool(
+                "browser_run_script", {"script_path": str(script), "attach_browser": True}
+            )
+        )
+        elapsed = time.perf_counter() - started
+        print(f"\n[e2e] attached script ran in {elapsed:.2f}s", file=sys.stderr)
+
+        self.assertEqual(reply["exit_code"], 0, reply)
+        self.assertEqual(reply["stdout"].strip(), "attached-script")
+        title = server.call_tool("browser_evaluate", {"script": "document.title"})
+        self.assertEqual(json.loads(title), {"result": "agent-page"})
+        self.assertNotIn("attached-script", server.call_tool("browser_list_tabs", {}))
+
+
 # ---------------------------------------------------------------------------
 # Stray-process guard
 # ---------------------------------------------------------------------------
@@ -76,6 +76,7 @@ Configurable agent LLM (profiles-inference-redirect):
 
 import atexit
 import asyncio
+import contextlib
 import importlib.util
 import json
 import os
@@ -84,6 +85,7 @@ import sys
 import threading
 import time
 import unittest
+from collections import deque
 from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock, call, patch
 
@@ -158,6 +160,7 @@ class _StubBrowserUseServer:
         # and calls @self.server.list_tools() as a decorator.
         mock_server = MagicMock()
         mock_server.request_handlers = {}
+        mock_server.notification_handlers = {}
         mock_server.list_tools.return_value = lambda fn: fn
         # main() awaits server.server.run(...) — a bare MagicMock is not awaitable.
         mock_server.run = AsyncMock(return_value=None)
@@ -173,7 +176,7 @@ class _StubBrowserUseServer:
 
     # ------------------------------------------------------------------
     # Session lifecycle — faithful transcription of upstream's semantics
-    # (browser_use/mcp/server.py:1143-1229, browser-use 0.13.x).  The Magus
+    # (browser_use/mcp/server.py:1116-1229, browser-use 0.13.x).  The Magus
     # subclass overrides these, so the stub must behave like the real parent
     # or the overrides would be tested against a fiction.  A static check
     # (TestAutoCleanupStaticChecks) asserts the overrides still delegate.
@@ -201,6 +204,29 @@ class _StubBrowserUseServer:
         except Exception as exc:
             return f"Error closing session {session_id}: {exc}"
 
+    async def _list_sessions(self):
+        if not self.active_sessions:
+            return "No active browser sessions"
+
+        sessions_info = []
+        for session_id, session_data in self.active_sessions.items():
+            session = session_data["session"]
+            created_at = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(session_data["created_at"]))
+            last_activity = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(session_data["last_activity"]))
+            is_active = hasattr(session, "cdp_client") and session.cdp_client is not None
+            sessions_info.append(
+                {
+                    "session_id": session_id,
+                    "created_at": created_at,
+                    "last_activity": last_activity,
+                    "active": is_active,
+                    "current_url": session_data.get("url", "Unknown"),
+                    "age_minutes": (time.time() - session_data["created_at"]) / 60,
+                }
+            )
+
+        return json.dumps(sessions_info, indent=2)
+
     async def _close_all_sessions(self):
         if not self.active_sessions:
             return "No active sessions to close"
@@ -215,6 +241,10 @@ class _StubBrowserUseServer:
         self.tools = None
         return f"Closed {closed_count} sessions"
 
+    def _update_session_activity(self, session_id):
+        if session_id in self.active_sessions:
+            self.active_sessions[session_id]["last_activity"] = time.time()
+
     async def _cleanup_expired_sessions(self):
         current_time = time.time()
         timeout_seconds = self.session_timeout_minutes * 60
@@ -327,6 +357,10 @@ def _load_module() -> object:
     # Prevent the asyncio.run(main()) block from firing
     sys.argv = ["mcp-server.py"]
     spec.loader.exec_module(mod)
+    # browser_use is imported on first use, not at module load. Force it now,
+    # while the stubs are installed — otherwise the first `_mod.MagusBrowserServer`
+    # in a test would import the real package.
+    mod._load_browser_use()
     return mod
 
 
@@ -713,6 +747,7 @@ class TestCustomToolsRegistered(unittest.TestCase):
         "browser_keyboard",
         "browser_focus",
         "browser_doctor",
+        "browser_metrics",
         "browser_start_cloud_session",
         "browser_set_agent_model",
     )
@@ -1034,6 +1069,24 @@ def _session_with_browser_tree(proc):
     return session
 
 
+def _reapable_process(name: str) -> MagicMock:
+    """
+    A psutil.Process stand-in for process_iter() that exits when signalled.
+
+    The reaper waits for what it terminates, so a mock that stays "running"
+    forever would cost each test the whole SIGTERM grace period.
+    """
+    proc = MagicMock(name=name)
+    proc.is_running.return_value = True
+
+    def exit_now():
+        proc.is_running.return_value = False
+
+    proc.terminate.side_effect = exit_now
+    proc.kill.side_effect = exit_now
+    return proc
+
+
 class TestShutdownWaitsForTheBrowserTree(unittest.TestCase):
     """
     _shutdown_sync must not remove the profile directory until every process
@@ -1159,6 +1212,226 @@ class TestShutdownWaitsForTheBrowserTree(unittest.TestCase):
         self.assertFalse(profile_dir.exists(), "the profile dir must still be freed")
 
 
+class TestParallelShutdown(unittest.TestCase):
+    """
+    Sessions are torn down concurrently under one shared deadline: shutdown
+    costs the slowest browser, not the sum of them, and the profile removal
+    still runs before the supervisor loses patience.
+    """
+
+    def _server_with_sessions(self, procs):
+        server = _make_server()
+        sessions = [_session_with_browser_tree(proc) for proc in procs]
+        server.browser_session = sessions[0]
+        server.active_sessions = {
+            f"s{index}": {"session": session} for index, session in enumerate(sessions)
+        }
+        return server, sessions
+
+    def test_slow_trees_are_waited_for_in_parallel(self):
+        helpers = [_FakeChromeProcess(pid=424300 + i, lifetime=0.4) for i in range(3)]
+        browsers = [
+            _FakeChromeProcess(pid=424310 + i, lifetime=0.0, children=[helper])
+            for i, helper in enumerate(helpers)
+        ]
+        server, _ = self._server_with_sessions(browsers)
+
+        with _fake_home():
+            started = time.monotonic()
+            server._shutdown_sync()
+            elapsed = time.monotonic() - started
+
+        self.assertTrue(all(not helper.is_running() for helper in helpers))
+        self.assertLess(
+            elapsed,
+            0.9,
+            f"three 0.4s teardowns took {elapsed:.2f}s — they ran one after another",
+        )
+
+    def test_one_deadline_bounds_every_session(self):
+        def unkillable(pid):
+            helper = MagicMock(name=f"helper-{pid}")
+            helper.is_running.return_value = True
+            helper.status.return_value = "running"
+            return helper
+
+        browsers = [
+            _FakeChromeProcess(pid=424320 + i, lifetime=0.0, children=[unkillable(i)])
+            for i in range(4)
+        ]
+        server, _ = self._server_with_sessions(browsers)
+
+        with _fake_home() as (_, profile_dir), patch.object(_mod, "_SHUTDOWN_KILL_DEADLINE", 0.3):
+            started = time.monotonic()
+            server._shutdown_sync()
+            elapsed = time.monotonic() - started
+            removed = not profile_dir.exists()
+
+        self.assertTrue(all(browser.terminated for browser in browsers))
+        self.assertLess(elapsed, 0.3 + 1.0, f"shutdown took {elapsed:.2f}s past a 0.3s deadline")
+        self.assertTrue(removed, "the profile directory must still be removed")
+
+    def test_signal_handler_path_skips_the_loop_bound_graceful_kill(self):
+        procs = [_FakeChromeProcess(pid=424330 + i, lifetime=0.0) for i in range(2)]
+        sessions = [_session_with_browser_tree(proc) for proc in procs]
+
+        async def from_inside_the_loop():
+            _mod.MagusBrowserServer._kill_sessions_sync(sessions, time.monotonic() + 2.0)
+
+        asyncio.run(from_inside_the_loop())
+
+        for session in sessions:
+            session.kill.assert_not_called()
+        self.assertTrue(all(proc.terminated for proc in procs))
+
+    def test_debug_flag_reports_each_kill_on_stderr(self):
+        procs = [_FakeChromeProcess(pid=424340 + i, lifetime=0.0) for i in range(2)]
+        sessions = [_session_with_browser_tree(proc) for proc in procs]
+        for index, session in enumerate(sessions):
+            session.id = f"sess-{index}"
+
+        with (
+            patch.dict(os.environ, {_mod._SHUTDOWN_DEBUG_ENV: "1"}),
+            _captured_streams() as (out, err),
+        ):
+            _mod.MagusBrowserServer._kill_sessions_sync(sessions, time.monotonic() + 2.0)
+
+        self.assertEqual(out.getvalue(), "", "stdout carries MCP's JSON-RPC")
+        report = err.getvalue()
+        for session_id in ("sess-0", "sess-1"):
+            self.assertRegex(report, rf"session {session_id}\): \d+\.\d{{3}}s")
+
+
+_HAVE_EXIT_NOTIFICATIONS = hasattr(os, "pidfd_open") or hasattr(__import__("select"), "kqueue")
+
+
+def _spawn_sleeper():
+    """A real child process that lives until it is killed."""
+    import subprocess
+
+    import psutil
+
+    child = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    return child, psutil.Process(child.pid)
+
+
+def _kill_later(child, delay: float) -> list:
+    """SIGKILL `child` after `delay`; the returned list receives the kill time."""
+    killed_at: list = []
+
+    def kill():
+        killed_at.append(time.monotonic())
+        child.kill()
+
+    timer = threading.Timer(delay, kill)
+    timer.start()
+    return killed_at
+
+
+class _PollingOnlyExitWatch(_mod._ProcessExitWatch if _mod else object):
+    """The pre-notification behaviour: watch nothing, re-check on a timer."""
+
+    def _watch(self, pid):
+        return False
+
+
+@unittest.skipUnless(_HAVE_EXIT_NOTIFICATIONS, "no pidfd_open or kqueue on this platform")
+class TestEventDrivenExitWait(unittest.TestCase):
+    """
+    _wait_for_processes_gone sleeps on kernel exit notifications (pidfd on
+    Linux, kqueue on macOS) instead of re-checking every 20ms.
+    """
+
+    def _sleeper(self):
+        child, proc = _spawn_sleeper()
+
+        def reap():
+            child.kill()
+            child.wait(5)
+
+        self.addCleanup(reap)
+        return child, proc
+
+    def test_returns_as_soon_as_a_real_process_exits(self):
+        child, proc = self._sleeper()
+        killed_at = _kill_later(child, 0.2)
+
+        survivors = _mod._wait_for_processes_gone([proc], 5.0)
+        woke_at = time.monotonic()
+
+        self.assertEqual(survivors, [])
+        self.assertLess(woke_at - killed_at[0], 0.5)
+
+    def test_times_out_with_the_survivors(self):
+        _, proc = self._sleeper()
+
+        started = time.monotonic()
+        survivors = _mod._wait_for_processes_gone([proc], 0.2)
+
+        self.assertEqual(survivors, [proc])
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    def test_exit_status_is_left_for_the_parent_to_collect(self):
+        """Reaping here would steal the status from asyncio's child watcher."""
+        child, proc = self._sleeper()
+        _kill_later(child, 0.05)
+
+        _mod._wait_for_processes_gone([proc], 5.0)
+
+        self.assertEqual(child.wait(5), -signal.SIGKILL)
+
+    def test_unwatchable_processes_are_still_polled(self):
+        child, proc = self._sleeper()
+        fake = _FakeChromeProcess(pid=424400, lifetime=0.0)
+        fake.terminate()
+        _kill_later(child, 0.1)
+
+        self.assertEqual(_mod._wait_for_processes_gone([proc, fake], 5.0), [])
+
+
+@unittest.skipUnless(_HAVE_EXIT_NOTIFICATIONS, "no pidfd_open or kqueue on this platform")
+class TestExitWaitBenchmark(unittest.TestCase):
+    """
+    Wake-up latency (SIGKILL -> return) and CPU spent while waiting on one
+    child, event-driven vs the previous 20ms psutil poll. Medians of 5 waits
+    of ~0.5s each. Measured on a Linux dev box (pidfd): latency 0.9ms vs
+    9ms, CPU 0.45ms vs 6.5ms per wait.
+    """
+
+    ROUNDS = 5
+
+    def _measure(self) -> tuple[float, float]:
+        import statistics
+
+        latencies, cpu = [], []
+        for _ in range(self.ROUNDS):
+            child, proc = _spawn_sleeper()
+            try:
+                killed_at = _kill_later(child, 0.5)
+                cpu_before = time.thread_time()
+                _mod._wait_for_processes_gone([proc], 5.0)
+                cpu.append(time.thread_time() - cpu_before)
+                latencies.append(time.monotonic() - killed_at[0])
+            finally:
+                child.kill()
+                child.wait(5)
+        return statistics.median(latencies), statistics.median(cpu)
+
+    def test_event_driven_wait_beats_polling(self):
+        event_latency, event_cpu = self._measure()
+        with patch.object(_mod, "_ProcessExitWatch", _PollingOnlyExitWatch):
+            poll_latency, poll_cpu = self._measure()
+
+        print(
+            f"\nexit wait: event-driven latency {event_latency * 1000:.1f}ms "
+            f"cpu {event_cpu * 1000:.2f}ms | polling latency "
+            f"{poll_latency * 1000:.1f}ms cpu {poll_cpu * 1000:.2f}ms",
+            file=sys.stderr,
+        )
+        self.assertLess(event_latency, poll_latency)
+        self.assertLess(event_cpu, poll_cpu)
+
+
 class TestProfileDirRemovalIsVerified(unittest.TestCase):
     """
     _remove_session_profile_dir must confirm the directory is gone, not assume
@@ -1305,6 +1578,11 @@ def _server_with_cdp(returns=None):
     return server, fake_cdp
 
 
+def _packed(value):
+    """A Runtime reply carrying `value` the way the page's result packer does."""
+    return {"result": {"type": "object", "value": {"json": json.dumps(value)}}}
+
+
 class TestEvaluateTool(unittest.IsolatedAsyncioTestCase):
     """browser_evaluate runs JS in the LIVE page (self.browser_session) via
     Runtime.evaluate with returnByValue + awaitPromise, IIFE-wrapping `return`."""
@@ -1316,28 +1594,24 @@ class TestEvaluateTool(unittest.IsolatedAsyncioTestCase):
         self.assertIn("No browser session", out)
 
     async def test_plain_expression_passed_through(self):
-        server, cdp = _server_with_cdp(
-            returns={"Runtime.evaluate": {"result": {"value": "Hello"}}}
-        )
+        server, cdp = _server_with_cdp(returns={"Runtime.evaluate": _packed("Hello")})
         out = await server._handle_evaluate({"script": "document.title"})
         path, params = cdp.cdp_client.calls[-1]
         self.assertEqual(path, "Runtime.evaluate")
-        self.assertEqual(params["expression"], "document.title")
+        self.assertIn("return (\ndocument.title\n)", params["expression"])
         self.assertTrue(params["returnByValue"])
         self.assertTrue(params["awaitPromise"])
         self.assertEqual(json.loads(out), {"result": "Hello"})
 
     async def test_return_statement_is_iife_wrapped(self):
         """The report's `return monaco...setValue()` must not SyntaxError."""
-        server, cdp = _server_with_cdp(
-            returns={"Runtime.evaluate": {"result": {"value": None}}}
-        )
+        server, cdp = _server_with_cdp(returns={"Runtime.evaluate": _packed(None)})
         await server._handle_evaluate(
             {"script": "return monaco.editor.getModels()[0].setValue('x')"}
         )
         _, params = cdp.cdp_client.calls[-1]
         self.assertTrue(
-            params["expression"].startswith("(function(){"),
+            params["expression"].startswith("Promise.resolve((function(){ return monaco"),
             f"return-bearing script must be IIFE-wrapped, got: {params['expression']!r}",
         )
 
@@ -1345,21 +1619,17 @@ class TestEvaluateTool(unittest.IsolatedAsyncioTestCase):
         """REGRESSION: an expression that merely CONTAINS 'return' must pass
         through unwrapped, or it silently becomes a no-return function → null.
         (Verified live: `"returned"` returned null before the fix.)"""
-        server, cdp = _server_with_cdp(
-            returns={"Runtime.evaluate": {"result": {"value": "returned"}}}
-        )
+        server, cdp = _server_with_cdp(returns={"Runtime.evaluate": _packed("returned")})
         out = await server._handle_evaluate({"script": '"returned"'})
         _, params = cdp.cdp_client.calls[-1]
-        self.assertEqual(params["expression"], '"returned"')  # NOT wrapped
+        self.assertIn('return (\n"returned"\n)', params["expression"])  # Its value, returned.
         self.assertEqual(json.loads(out), {"result": "returned"})
 
     async def test_querySelector_return_class_not_wrapped(self):
-        server, cdp = _server_with_cdp(
-            returns={"Runtime.evaluate": {"result": {"value": "found"}}}
-        )
+        server, cdp = _server_with_cdp(returns={"Runtime.evaluate": _packed("found")})
         await server._handle_evaluate({"script": "document.querySelector('.return-btn')"})
         _, params = cdp.cdp_client.calls[-1]
-        self.assertNotIn("(function(){", params["expression"])
+        self.assertIn("return (\ndocument.querySelector('.return-btn')\n)", params["expression"])
 
     async def test_js_exception_surfaced_not_silent(self):
         server, cdp = _server_with_cdp(
@@ -1406,6 +1676,383 @@ class TestWrapEvalScript(unittest.TestCase):
         self.assertEqual(self.wrap('returned'), 'returned')
 
 
+class TestEvalScriptCache(unittest.IsolatedAsyncioTestCase):
+    """A script's second run compiles it into a function handle; later runs
+    call the handle instead of re-sending and re-parsing the source."""
+
+    def _server(self, compiled=None, called=None, bare=None):
+        """A server whose page compiles to `compiled`, runs handles to `called`
+        and bare (declaration) scripts to `bare`; packed runs return 2."""
+        server, cdp = _server_with_cdp(
+            returns={"Runtime.callFunctionOn": called or _packed(2)}
+        )
+        client = cdp.cdp_client
+        runtime = client.send.Runtime
+
+        async def evaluate(params=None, session_id=None):
+            client.calls.append(("Runtime.evaluate", params))
+            if "objectGroup" in params:  # The compile step.
+                return compiled or {"result": {"objectId": "fn-1"}}
+            if params["expression"].startswith("Promise.resolve("):
+                if bare is not None:
+                    return {"exceptionDetails": {"exception": {"className": "SyntaxError"}}}
+                return _packed(2)
+            pack = f"({_mod._EVAL_PACK_JS})("
+            if params["expression"].startswith(pack):  # Packing a bare script's primitive.
+                literal = params["expression"][len(pack):].split(", ")[0]
+                return _packed(None if literal == "undefined" else json.loads(literal))
+            return bare or {}
+
+        runtime.evaluate = evaluate
+        client.send = MagicMock(Runtime=runtime)
+        return server, cdp
+
+    async def test_first_run_evaluates_second_compiles_third_hits(self):
+        server, cdp = self._server()
+        script = "const x = 1; return x + 1"
+        for _ in range(3):
+            self.assertEqual(json.loads(await server._handle_evaluate({"script": script})), {"result": 2})
+        paths = [p for p, _ in cdp.cdp_client.calls]
+        self.assertEqual(
+            paths,
+            ["Runtime.evaluate", "Runtime.evaluate", "Runtime.callFunctionOn", "Runtime.callFunctionOn"],
+        )
+        _, compile_params = cdp.cdp_client.calls[1]
+        self.assertEqual(compile_params["expression"], "(function(){ const x = 1; return x + 1\n })")
+        self.assertNotIn("returnByValue", compile_params)
+        _, call = cdp.cdp_client.calls[-1]
+        self.assertEqual(call["objectId"], "fn-1")
+        self.assertTrue(call["returnByValue"] and call["awaitPromise"] and call["userGesture"])
+        self.assertNotIn(script, call["functionDeclaration"])
+        self.assertEqual(server._eval_scripts.stats()["hits"], 2)
+
+    async def test_expression_compiles_to_a_returning_function(self):
+        src = _mod.MagusBrowserServer._eval_function_source("document.title;")
+        self.assertEqual(src, "(function(){ return (\ndocument.title\n); })")
+
+    async def test_declaration_is_marked_uncacheable(self):
+        """`let x = 1` is not an expression: it runs bare, once the packed
+        form fails to parse, and after one failed compile is never retried."""
+        server, cdp = self._server(
+            compiled={"exceptionDetails": {"text": "SyntaxError"}},
+            bare={"result": {"type": "undefined"}},
+        )
+        for _ in range(4):
+            out = await server._handle_evaluate({"script": "let x = 1"})
+            self.assertEqual(json.loads(out), {"result": None})
+        paths = [p for p, _ in cdp.cdp_client.calls]
+        self.assertEqual(paths.count("Runtime.callFunctionOn"), 0)
+        compiles = [c for c in cdp.cdp_client.calls if "objectGroup" in c[1]]
+        self.assertEqual(len(compiles), 1)
+        runs = [c for c in cdp.cdp_client.calls if c[1]["expression"] == "let x = 1"]
+        self.assertEqual(len(runs), 4)
+
+    async def test_syntax_error_thrown_at_runtime_is_not_run_again(self):
+        """JSON.parse('x') throws a SyntaxError after the script ran. The
+        function compiles, so that error is the result: nothing runs twice."""
+        server, cdp = self._server(bare={"result": {"type": "undefined"}})
+        out = await server._handle_evaluate({"script": "JSON.parse('x')"})
+        self.assertEqual(json.loads(out)["error"], "JavaScript exception")
+        expressions = [params["expression"] for _, params in cdp.cdp_client.calls]
+        self.assertEqual(sum(e.startswith("Promise.resolve(") for e in expressions), 1)
+        self.assertNotIn("JSON.parse('x')", expressions)
+        # The check compiled it, so the next run is a cache hit.
+        self.assertEqual(server._eval_scripts.stats()["handles"], 1)
+
+    async def test_leading_brace_keeps_block_semantics(self):
+        """`{a:1}` is a block to Runtime.evaluate (value 1); returned from a
+        function it would be an object. It keeps running as a script."""
+        server, cdp = self._server(bare={"result": {"type": "number", "value": 1}})
+        for _ in range(3):
+            out = await server._handle_evaluate({"script": "{a:1}"})
+            self.assertEqual(json.loads(out), {"result": 1})
+        expressions = [params["expression"] for _, params in cdp.cdp_client.calls]
+        self.assertEqual(expressions.count("{a:1}"), 3)
+        self.assertFalse(any(e.startswith("Promise.resolve(") for e in expressions))
+        self.assertIsNone(_mod.MagusBrowserServer._eval_function_source(" {a:1};"))
+        self.assertEqual(server._eval_scripts.stats()["size"], 0)
+
+    async def test_navigation_drops_handles_then_hits_again(self):
+        """A navigation kills every handle without telling us. The next run
+        finds its handle gone, runs the script once the uncached way, and
+        the run after that compiles a fresh handle that later runs hit."""
+        server, cdp = self._server()
+        client = cdp.cdp_client
+        page = {"handles": set(), "next": 0, "runs": 0}
+
+        async def evaluate(params=None, session_id=None):
+            client.calls.append(("Runtime.evaluate", params))
+            if "objectGroup" in params:
+                page["next"] += 1
+                handle = f"fn-{page['next']}"
+                page["handles"].add(handle)
+                return {"result": {"objectId": handle}}
+            page["runs"] += 1
+            return _packed(2)
+
+        async def call_function_on(params=None, session_id=None):
+            client.calls.append(("Runtime.callFunctionOn", params))
+            if params["objectId"] not in page["handles"]:
+                raise RuntimeError("Could not find object with given id")
+            page["runs"] += 1
+            return _packed(2)
+
+        client.send.Runtime.evaluate = evaluate
+        client.send.Runtime.callFunctionOn = call_function_on
+
+        async def run():
+            before = page["runs"]
+            self.assertEqual(json.loads(await server._handle_evaluate({"script": "return 2"})), {"result": 2})
+            self.assertEqual(page["runs"], before + 1, "the script must run exactly once per call")
+            return client.calls[-1]
+
+        for _ in range(3):
+            await run()
+        self.assertEqual(client.calls[-1][1]["objectId"], "fn-1")
+
+        page["handles"].clear()  # Page.navigate: a new execution context.
+        path, params = await run()
+        self.assertEqual(path, "Runtime.evaluate")
+        self.assertTrue(params["expression"].startswith("Promise.resolve("))
+
+        await run()  # Recompiles...
+        path, params = await run()  # ...and hits the fresh handle.
+        self.assertEqual((path, params["objectId"]), ("Runtime.callFunctionOn", "fn-2"))
+
+    async def test_stale_handle_falls_back_and_recompiles(self):
+        """After a navigation the handle is gone: the run must still happen
+        (plain evaluate), and the next run compiles a fresh handle."""
+        server, cdp = self._server()
+        script = "return 2"
+        await server._handle_evaluate({"script": script})
+        await server._handle_evaluate({"script": script})  # compiled, fn-1
+
+        async def gone(params=None, session_id=None):
+            cdp.cdp_client.calls.append(("Runtime.callFunctionOn", params))
+            raise RuntimeError("Could not find object with given id")
+
+        cdp.cdp_client.send.Runtime.callFunctionOn = gone
+        out = await server._handle_evaluate({"script": script})
+        self.assertEqual(json.loads(out), {"result": 2})
+        self.assertEqual(cdp.cdp_client.calls[-1][0], "Runtime.evaluate")
+        self.assertEqual(server._eval_scripts.stats()["handles"], 0)
+
+        cdp.cdp_client.calls.clear()
+        await server._handle_evaluate({"script": script})
+        self.assertIn("objectGroup", cdp.cdp_client.calls[0][1])
+
+    async def test_lru_eviction_releases_handles(self):
+        server, cdp = self._server()
+        server._eval_scripts.size = 2
+        for n in range(3):
+            for _ in range(2):
+                await server._handle_evaluate({"script": f"return {n}"})
+        released = [params for path, params in cdp.cdp_client.calls if path == "Runtime.releaseObject"]
+        self.assertEqual(len(released), 1)
+        self.assertEqual(server._eval_scripts.stats()["size"], 2)
+
+    async def test_doctor_reports_cache(self):
+        server, _ = self._server()
+        for _ in range(3):
+            await server._handle_evaluate({"script": "return 1"})
+        report = json.loads(await server._handle_doctor({}))
+        self.assertEqual(
+            report["eval_script_cache"], {"size": 1, "handles": 1, "hits": 2, "misses": 1}
+        )
+
+
+class TestEvaluateResultTransfer(unittest.IsolatedAsyncioTestCase):
+    """Results come back as the page's JSON text; one over the inline limit
+    stays in the page and is pulled in chunks into a file."""
+
+    def _server(self, text, fail_at=None, declaration=False):
+        """A page whose script result serializes to `text`, parked by id when
+        it exceeds the inline limit the server asks for. A `declaration` only
+        runs bare, leaving its value as handle obj-1 to pack."""
+        server, cdp = _server_with_cdp()
+        client = cdp.cdp_client
+        runtime = client.send.Runtime
+
+        # The page measures and slices in UTF-16 units, as JavaScript does.
+        units = text.encode("utf-16-le")
+        length = len(units) // 2
+
+        def pack(limit):
+            if limit and length > limit:
+                return {"result": {"value": {"id": "r1", "length": length, "preview": text[:5]}}}
+            return {"result": {"value": {"json": text}}}
+
+        def chunk(start, size):
+            end = min(start + size, length)
+            if end < length and 0xD800 <= int.from_bytes(units[2 * end - 2:2 * end], "little") <= 0xDBFF:
+                end -= 1
+            return {"data": units[2 * start:2 * end].decode("utf-16-le"), "next": end}
+
+        async def call_function_on(params=None, session_id=None):
+            client.calls.append(("Runtime.callFunctionOn", params))
+            return pack(params["arguments"][0]["value"])
+
+        async def evaluate(params=None, session_id=None):
+            client.calls.append(("Runtime.evaluate", params))
+            expression = params["expression"]
+            if declaration:
+                if "objectGroup" in params or expression.startswith("Promise.resolve("):
+                    return {"exceptionDetails": {"exception": {"className": "SyntaxError"}}}
+                if not expression.startswith(_mod._EVAL_CHUNK_JS):
+                    return {"result": {"type": "object", "objectId": "obj-1"}}
+            if expression.startswith("Promise.resolve("):
+                return pack(int(expression.rsplit("(v, ", 1)[1].split(",")[0]))
+            if expression.startswith(_mod._EVAL_CHUNK_JS):
+                start, size = (int(arg) for arg in expression.rstrip(")").split(", ")[-2:])
+                if fail_at is not None and start >= fail_at:
+                    return {"exceptionDetails": {"exception": {"description": "Error: result is gone"}}}
+                return {"result": {"value": chunk(start, size)}}
+            return {}
+
+        runtime.evaluate = evaluate
+        runtime.callFunctionOn = call_function_on
+        client.send = MagicMock(Runtime=runtime)
+        return server, cdp
+
+    async def test_small_result_is_spliced_in_without_reencoding(self):
+        server, _ = self._server('{"a":[1,2],"b":"\u00e9"}')
+        out = await server._handle_evaluate({"script": "window.data"})
+        self.assertEqual(out, '{"result": {"a":[1,2],"b":"\u00e9"}}')
+
+    async def test_large_result_is_streamed_to_a_file_in_chunks(self):
+        text = json.dumps("x" * 100)
+        server, cdp = self._server(text)
+        with _fake_home(create_profile_dir=False) as (home, _), \
+                patch.dict(os.environ, {"BROWSER_USE_EVAL_INLINE_MAX": "50"}), \
+                patch.object(_mod, "_EVAL_CHUNK_CHARS", 16):
+            data = json.loads(await server._handle_evaluate({"script": "big()"}))
+            path = Path(data["result_file"])
+            self.assertEqual(path.parent, home / ".config" / "browseruse" / "magus" / "eval-results")
+            self.assertEqual(path.read_text(), text)
+            self.assertEqual(list(path.parent.iterdir()), [path])  # No temp file left.
+        self.assertEqual(data["length"], len(text))
+        self.assertEqual(data["preview"], text[:5])
+        chunks = [c for c in cdp.cdp_client.calls if c[1]["expression"].startswith(_mod._EVAL_CHUNK_JS)]
+        self.assertEqual(len(chunks), -(-len(text) // 16))
+
+    async def test_a_surrogate_pair_on_a_chunk_boundary_stays_whole(self):
+        # "x" * 14 puts the emoji's two UTF-16 units at offsets 15 and 16:
+        # the first 16-unit slice would end on its high half.
+        text = json.dumps("x" * 14 + "\U0001F600" + "y" * 80, ensure_ascii=False)
+        server, cdp = self._server(text)
+        with _fake_home(create_profile_dir=False), \
+                patch.dict(os.environ, {"BROWSER_USE_EVAL_INLINE_MAX": "50"}), \
+                patch.object(_mod, "_EVAL_CHUNK_CHARS", 16):
+            data = json.loads(await server._handle_evaluate({"script": "big()"}))
+            self.assertEqual(Path(data["result_file"]).read_text(encoding="utf-8"), text)
+        chunks = [c for c in cdp.cdp_client.calls if c[1]["expression"].startswith(_mod._EVAL_CHUNK_JS)]
+        self.assertEqual(chunks[1][1]["expression"].split(", ")[-2], "15")
+
+    async def test_failed_transfer_leaves_no_file_and_frees_the_page(self):
+        server, cdp = self._server(json.dumps("x" * 100), fail_at=32)
+        with _fake_home(create_profile_dir=False) as (home, _), \
+                patch.dict(os.environ, {"BROWSER_USE_EVAL_INLINE_MAX": "50"}), \
+                patch.object(_mod, "_EVAL_CHUNK_CHARS", 16):
+            out = await server._handle_evaluate({"script": "big()"})
+            self.assertEqual(list((home / ".config" / "browseruse" / "magus" / "eval-results").iterdir()), [])
+        self.assertIn("could not transfer the result", out)
+        self.assertIn("result is gone", out)
+        self.assertIn('.delete("r1")', cdp.cdp_client.calls[-1][1]["expression"])
+
+    async def test_large_declaration_result_spills_like_any_other(self):
+        text = json.dumps("x" * 100)
+        server, cdp = self._server(text, declaration=True)
+        with _fake_home(create_profile_dir=False), \
+                patch.dict(os.environ, {"BROWSER_USE_EVAL_INLINE_MAX": "50"}):
+            data = json.loads(await server._handle_evaluate({"script": "if (true) big()"}))
+            self.assertEqual(Path(data["result_file"]).read_text(), text)
+        pack = next(params for path, params in cdp.cdp_client.calls if path == "Runtime.callFunctionOn")
+        self.assertEqual(pack["objectId"], "obj-1")
+        self.assertIn(_mod._EVAL_PACK_JS, pack["functionDeclaration"])
+        runs = [c for c in cdp.cdp_client.calls if c[1].get("expression") == "if (true) big()"]
+        self.assertEqual(len(runs), 1)
+        self.assertFalse(runs[0][1].get("returnByValue"))
+        released = [params for path, params in cdp.cdp_client.calls if path == "Runtime.releaseObject"]
+        self.assertEqual(released, [{"objectId": "obj-1"}])
+
+    async def test_inline_limit_zero_never_spills(self):
+        text = json.dumps("x" * 1000)
+        server, _ = self._server(text)
+        with patch.dict(os.environ, {"BROWSER_USE_EVAL_INLINE_MAX": "0"}):
+            out = await server._handle_evaluate({"script": "big()"})
+        self.assertEqual(json.loads(out), {"result": "x" * 1000})
+
+    def test_only_the_newest_spills_are_kept(self):
+        import shutil
+        import tempfile
+
+        directory = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        for n in range(5):
+            path = directory / f"{n}.json"
+            path.write_text("1")
+            os.utime(path, ns=(n * 10**9, n * 10**9))
+        _mod._prune_spill_files(directory, 2, ".json")
+        self.assertEqual(sorted(p.name for p in directory.iterdir()), ["3.json", "4.json"])
+
+
+@unittest.skipUnless(__import__("shutil").which("node"), "node not installed")
+class TestEvalResultPacking(unittest.TestCase):
+    """_EVAL_PACK_JS, the in-page serializer every browser_evaluate result
+    goes through, run under node: what returnByValue used to pass back must
+    still come back as a value, not a JavaScript exception."""
+
+    def _pack(self, setup, value="v", max_chars=0):
+        import subprocess
+
+        program = (
+            f"{setup}\n"
+            f"const out = ({_mod._EVAL_PACK_JS})({value}, {max_chars}, 5);\n"
+            "process.stdout.write(JSON.stringify(out));"
+        )
+        proc = subprocess.run(["node", "-e", program], capture_output=True, text=True, timeout=30)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        return json.loads(proc.stdout)
+
+    def test_bigint_is_written_as_its_literal(self):
+        packed = self._pack("const v = {n: 12345678901234567890n};")
+        self.assertEqual(json.loads(packed["json"]), {"n": "12345678901234567890n"})
+        self.assertEqual(json.loads(self._pack("", value="12n")["json"]), "12n")
+
+    def test_cycles_are_cut_but_shared_objects_are_not(self):
+        packed = self._pack(
+            "const shared = {x: 1};"
+            " const v = {a: shared, b: [shared], child: {}};"
+            " v.self = v; v.child.parent = v;"
+        )
+        self.assertEqual(
+            json.loads(packed["json"]),
+            {"a": {"x": 1}, "b": [{"x": 1}], "child": {"parent": "[Circular]"}, "self": "[Circular]"},
+        )
+
+    def test_chunks_never_split_a_surrogate_pair(self):
+        import subprocess
+
+        program = (
+            f"const json = JSON.stringify('x'.repeat(14) + '\\u{{1F600}}' + 'y'.repeat(5));\n"
+            f"{_mod._EVAL_STORE_JS} = new Map([['r1', json]]);\n"
+            "const out = []; let start = 0;\n"
+            f"while (start < json.length) {{ const c = ({_mod._EVAL_CHUNK_JS})('r1', start, 16);"
+            " out.push(c.data); start = c.next; }\n"
+            f"process.stdout.write(JSON.stringify({{chunks: out, left: {_mod._EVAL_STORE_JS}.size}}));"
+        )
+        proc = subprocess.run(["node", "-e", program], capture_output=True, text=True, timeout=30)
+        self.assertEqual(proc.returncode, 0, proc.stderr)
+        result = json.loads(proc.stdout)
+        self.assertEqual(result["chunks"], ['"' + "x" * 14, "\U0001F600" + "y" * 5 + '"'])
+        self.assertEqual(result["left"], 0, "the last slice forgets the result")
+
+    def test_undefined_is_null_and_large_results_are_parked(self):
+        self.assertEqual(self._pack("", value="undefined"), {"json": "null"})
+        packed = self._pack("const v = 'x'.repeat(100);", max_chars=50)
+        self.assertEqual((packed["length"], packed["preview"]), (102, '"xxxx'))
+
+
 class TestFocusTool(unittest.IsolatedAsyncioTestCase):
     async def test_focus_uses_selector_and_reports_match(self):
         server, cdp = _server_with_cdp(
@@ -1533,6 +2180,254 @@ class TestParseKeySpec(unittest.TestCase):
         self.assertEqual(_mod.MagusBrowserServer._command_for(8, "a"), [])
 
 
+class _LatencyCDPSession:
+    """
+    A CDP session whose every reply takes `rtt` seconds, like a remote browser.
+
+    Records each send the moment it is issued, and the most sends that were
+    ever awaiting a reply at once. `fail_at` makes those call indexes raise.
+    """
+
+    def __init__(self, rtt: float = 0.0, fail_at=()):
+        self.session_id = "cdp-sess-rtt"
+        self.sent: list[tuple[str, dict]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        session = self
+
+        class _Input:
+            def __getattr__(self, method):
+                async def _call(params=None, session_id=None):
+                    index = len(session.sent)
+                    session.sent.append((method, params or {}))
+                    session.in_flight += 1
+                    session.max_in_flight = max(session.max_in_flight, session.in_flight)
+                    try:
+                        # Uneven delays, so replies come back out of order.
+                        await asyncio.sleep(rtt * (1 + index % 3) / 2)
+                    finally:
+                        session.in_flight -= 1
+                    if index in fail_at:
+                        raise RuntimeError(f"event {index} rejected")
+                    return {}
+                return _call
+
+        self.cdp_client = MagicMock()
+        self.cdp_client.send.Input = _Input()
+
+
+class TestPipelinedKeyDispatch(unittest.IsolatedAsyncioTestCase):
+    """
+    Every key used to cost two awaited CDP round trips; count=200 was 400 of
+    them in series. Keys are now sent without waiting on each reply.
+    """
+
+    async def test_order_survives_out_of_order_replies(self):
+        server = _make_server()
+        cdp = _LatencyCDPSession(rtt=0.002)
+
+        await server._dispatch_keys(cdp, ["a", "Meta+a", "Delete"], "done")
+
+        self.assertEqual(
+            [(method, params.get("type"), params.get("key")) for method, params in cdp.sent],
+            [
+                ("dispatchKeyEvent", "keyDown", "a"),
+                ("dispatchKeyEvent", "keyUp", "a"),
+                ("dispatchKeyEvent", "keyDown", "a"),
+                ("dispatchKeyEvent", "keyUp", "a"),
+                ("dispatchKeyEvent", "keyDown", "Delete"),
+                ("dispatchKeyEvent", "keyUp", "Delete"),
+                ("insertText", None, None),
+            ],
+        )
+        self.assertEqual(cdp.sent[2][1].get("commands"), ["selectAll"])
+
+    async def test_replies_are_not_awaited_one_by_one(self):
+        server = _make_server()
+        cdp = _LatencyCDPSession(rtt=0.002)
+
+        await server._dispatch_keys(cdp, ["x"] * 100)
+
+        self.assertEqual(len(cdp.sent), 200)
+        self.assertGreater(cdp.max_in_flight, 1)
+        self.assertLessEqual(cdp.max_in_flight, server._KEY_PIPELINE_WINDOW)
+
+    async def test_failures_are_collected_after_everything_is_sent(self):
+        server = _make_server()
+        cdp = _LatencyCDPSession(fail_at={1, 4})
+
+        with self.assertRaisesRegex(RuntimeError, "2 of 8 input events failed; first: event 1"):
+            await server._dispatch_keys(cdp, ["a", "b", "c", "d"])
+        self.assertEqual(len(cdp.sent), 8)
+
+    async def test_a_single_failure_is_raised_as_is(self):
+        server, _ = _server_with_cdp()
+        cdp = _LatencyCDPSession(fail_at={3})
+        server.browser_session.get_or_create_cdp_session = AsyncMock(return_value=cdp)
+
+        out = await server._handle_press_key({"key": "Enter", "count": 3})
+
+        self.assertEqual(out, "press_key failed: event 3 rejected")
+
+    async def test_pipelining_can_be_turned_off(self):
+        server = _make_server()
+        cdp = _LatencyCDPSession(rtt=0.001, fail_at={1})
+
+        with (
+            patch.dict(os.environ, {server._KEY_PIPELINE_ENV: "0"}),
+            self.assertRaisesRegex(RuntimeError, "event 1 rejected"),
+        ):
+            await server._dispatch_keys(cdp, ["a", "b"])
+        self.assertEqual(cdp.max_in_flight, 1)
+        self.assertEqual(len(cdp.sent), 2, "serial dispatch stops at the first failure")
+
+
+class TestKeyDispatchBenchmark(unittest.IsolatedAsyncioTestCase):
+    """
+    Keys/second for count=200 over a fake CDP client with a ~5ms round trip.
+    Measured on a Linux dev box outside the test runner's debug-mode loop:
+    ~90 keys/s serial, ~3300 keys/s pipelined (the 64-command window bounds it).
+    test_e2e_lifecycle.TestKeyThroughputAgainstChromium measures the same
+    against headless Chromium.
+    """
+
+    KEYS = 200
+
+    async def _keys_per_second(self, pipeline: str) -> float:
+        server = _make_server()
+        cdp = _LatencyCDPSession(rtt=0.005)
+        with patch.dict(os.environ, {server._KEY_PIPELINE_ENV: pipeline}):
+            started = time.perf_counter()
+            await server._dispatch_keys(cdp, ["ArrowDown"] * self.KEYS)
+            elapsed = time.perf_counter() - started
+        return self.KEYS / elapsed
+
+    async def test_pipelined_dispatch_beats_serial(self):
+        serial = await self._keys_per_second("0")
+        pipelined = await self._keys_per_second("1")
+
+        print(
+            f"\nkey dispatch @5ms rtt: serial {serial:.0f} keys/s | "
+            f"pipelined {pipelined:.0f} keys/s",
+            file=sys.stderr,
+        )
+        self.assertGreater(pipelined, serial * 5)
+
+
+def _attached_browser_session(targets=None, focus="T1"):
+    """
+    A BrowserSession stand-in with browser-use's SessionManager bookkeeping:
+    target_id -> attached CDP session ids, and the agent-focus target.
+    """
+    targets = {"T1": "s1", "T2": "s2"} if targets is None else targets
+    bs = MagicMock(name="browser_session")
+    bs.id = "live-session"
+    bs.agent_focus_target_id = focus
+    bs.session_manager._target_sessions = {t: {sid} for t, sid in targets.items()}
+
+    async def resolve(target_id=None, focus=False):
+        cdp = _FakeCDPSession()
+        cdp.session_id = targets[bs.agent_focus_target_id]
+        return cdp
+
+    bs.get_or_create_cdp_session = AsyncMock(side_effect=resolve)
+    return bs
+
+
+class TestCDPSessionCache(unittest.IsolatedAsyncioTestCase):
+    """
+    _live_cdp_session resolved the session from scratch on every live-page
+    call — with focus=True that is a runIfWaitingForDebugger round trip each.
+    """
+
+    def _server(self, bs=None):
+        server = _make_server()
+        server.browser_session = bs or _attached_browser_session()
+        server._update_session_activity = MagicMock()
+        return server
+
+    async def test_repeat_calls_reuse_the_session(self):
+        server = self._server()
+
+        first = await server._live_cdp_session(focus=True)
+        second = await server._live_cdp_session(focus=True)
+
+        self.assertIs(first, second)
+        server.browser_session.get_or_create_cdp_session.assert_awaited_once()
+        self.assertEqual(server._cdp_sessions.stats(), {"size": 1, "hits": 1, "misses": 1})
+
+    async def test_keyboard_tools_share_one_resolution(self):
+        server = self._server()
+
+        for _ in range(5):
+            await server._handle_press_key({"key": "a"})
+        await server._handle_keyboard({"text": "x"})
+
+        server.browser_session.get_or_create_cdp_session.assert_awaited_once()
+
+    async def test_detach_invalidates(self):
+        server = self._server()
+        await server._live_cdp_session()
+        # What SessionManager's Target.detachedFromTarget handler does.
+        server.browser_session.session_manager._target_sessions["T1"].clear()
+        server.browser_session.session_manager._target_sessions["T1"].add("s1-new")
+
+        await server._live_cdp_session()
+
+        self.assertEqual(server.browser_session.get_or_create_cdp_session.await_count, 2)
+        self.assertEqual(server._cdp_sessions.misses, 2)
+
+    async def test_destroyed_target_is_dropped(self):
+        server = self._server()
+        await server._live_cdp_session()
+        del server.browser_session.session_manager._target_sessions["T1"]
+        server.browser_session.agent_focus_target_id = "T2"
+
+        await server._live_cdp_session()
+
+        self.assertEqual(server._cdp_sessions.stats()["size"], 1, "T1's handle must go")
+
+    async def test_tab_switch_resolves_the_new_target_and_keeps_the_old(self):
+        server = self._server()
+        on_t1 = await server._live_cdp_session()
+        server.browser_session.agent_focus_target_id = "T2"
+        on_t2 = await server._live_cdp_session()
+        server.browser_session.agent_focus_target_id = "T1"
+        back_on_t1 = await server._live_cdp_session()
+
+        self.assertEqual(on_t2.session_id, "s2")
+        self.assertIs(back_on_t1, on_t1)
+        self.assertEqual(server.browser_session.get_or_create_cdp_session.await_count, 2)
+
+    async def test_a_different_browser_session_never_hits(self):
+        server = self._server()
+        await server._live_cdp_session()
+        server.browser_session = _attached_browser_session()
+        server._update_session_activity = MagicMock()
+
+        await server._live_cdp_session()
+
+        server.browser_session.get_or_create_cdp_session.assert_awaited_once()
+
+    async def test_focus_request_is_not_served_by_an_unfocused_resolution(self):
+        server = self._server()
+        await server._live_cdp_session(focus=False)
+        await server._live_cdp_session(focus=True)
+        await server._live_cdp_session(focus=False)
+
+        self.assertEqual(server.browser_session.get_or_create_cdp_session.await_count, 2)
+        self.assertEqual(server._cdp_sessions.hits, 1)
+
+    async def test_doctor_reports_the_counters(self):
+        server = self._server()
+        await server._live_cdp_session()
+        await server._live_cdp_session()
+
+        report = json.loads(await server._handle_doctor({}))
+
+        self.assertEqual(report["cdp_session_cache"], {"size": 1, "hits": 1, "misses": 1})
+
+
 class TestDoctorTool(unittest.IsolatedAsyncioTestCase):
     async def test_doctor_reports_core_fields(self):
         server = _make_server()
@@ -1572,49 +2467,1294 @@ class TestRunScriptFailFast(unittest.IsolatedAsyncioTestCase):
         self.assertIn(".py file", out)
 
 
-# ---------------------------------------------------------------------------
-# Test 7 (v1.2.0): Local sessions force Playwright's bundled Chromium
-# ---------------------------------------------------------------------------
-
-class TestChromiumChannel(unittest.TestCase):
+class TestRunScriptOutput(unittest.IsolatedAsyncioTestCase):
     """
-    Local sessions must pass channel='chromium' so browser-use launches
-    Playwright's bundled Chromium instead of the user's real Chrome.app
-    (which caused macOS link-hijack / focus-steal).
-
-    The setting alone does not achieve that — see TestProfileCarriesResolvedBinary
-    for the executable_path that does. It is still asserted here because a user
-    config may deliberately override it, which is what opts a profile out of our
-    binary resolution.
+    browser_run_script reads output as it is written: bounded in memory, the
+    whole of an overflowing stream in a log file, and progress notifications
+    while the script runs when the client asked for them.
     """
 
-    def _captured_profile(self):
+    def setUp(self):
+        import tempfile
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(_shutil.rmtree, self.tmp, ignore_errors=True)
+        home = _fake_home(create_profile_dir=False)
+        self.home, _ = home.__enter__()
+        self.addCleanup(home.__exit__, None, None, None)
+
+    def _script(self, body: str) -> str:
+        path = self.tmp / "job.py"
+        path.write_text(body)
+        return str(path)
+
+    async def _run(self, body: str, server=None, **args):
+        server = server or _make_server()
+        return json.loads(
+            await server._handle_run_script({"script_path": self._script(body), **args})
+        )
+
+    async def test_small_output_is_returned_whole_without_a_log(self):
+        out = await self._run("import sys\nprint('hi')\nprint('oops', file=sys.stderr)\n")
+        self.assertEqual(out, {"exit_code": 0, "stdout": "hi\n", "stderr": "oops\n"})
+        self.assertFalse(_mod._script_output_dir().exists())
+
+    async def test_large_output_keeps_head_and_tail_and_logs_everything(self):
+        body = (
+            "import sys\n"
+            "for n in range(200000):\n"
+            "    print(f'line {n:06d}')\n"
+            "print('done', file=sys.stderr)\n"
+        )
+        expected = "".join(f"line {n:06d}\n" for n in range(200000))
+        with patch.dict(os.environ, {_mod._SCRIPT_OUTPUT_MAX_ENV: "4096"}):
+            out = await self._run(body)
+        self.assertEqual(out["exit_code"], 0)
+        self.assertLess(len(out["stdout"]), 4096 + 200)
+        self.assertTrue(out["stdout"].startswith("line 000000\n"))
+        self.assertTrue(out["stdout"].endswith("line 199999\n"))
+        self.assertIn("bytes omitted; full output in", out["stdout"])
+        log = Path(out["stdout_file"])
+        self.assertEqual(log.parent, self.home / ".config" / "browseruse" / "magus" / "script-output")
+        self.assertEqual(log.read_text(), expected)
+        self.assertEqual(out["stdout_bytes"], len(expected))
+        self.assertEqual(out["stderr"], "done\n")
+        self.assertNotIn("stderr_file", out)
+
+    async def test_memory_stays_bounded_while_streaming(self):
+        stream = _mod._ScriptStream("stdout", 1024, self.tmp / "s.log")
+        for n in range(100):
+            await stream.feed(bytes([65 + n % 26]) * 4096)
+            self.assertLessEqual(len(stream.head) + len(stream.tail), 1024)
+        stream.close()
+        self.assertEqual((self.tmp / "s.log").stat().st_size, 100 * 4096)
+        self.assertEqual(stream.size, 100 * 4096)
+
+    async def test_a_first_chunk_over_the_limit_keeps_its_head(self):
+        stream = _mod._ScriptStream("stdout", 1024, self.tmp / "s.log")
+        await stream.feed(b"a" * 600 + b"b" * 2000 + b"c" * 600)
+        stream.close()
+        self.assertEqual(bytes(stream.head), b"a" * 512)
+        self.assertEqual(bytes(stream.tail), b"c" * 512)
+        self.assertEqual((self.tmp / "s.log").stat().st_size, 3200)
+
+    async def test_output_is_notified_while_the_script_runs(self):
         server = _make_server()
-        captured = {}
+        sent = []
 
-        class CapturingProfile:
-            def __init__(self, **kwargs):
-                captured.update(kwargs)
+        async def record(progress, message):
+            sent.append((time.monotonic(), progress, message))
 
-        mock_session = MagicMock()
-        mock_session.start = AsyncMock(return_value=None)
+        server._progress_reporter = lambda: record
+        started = time.monotonic()
+        out = await self._run(
+            "import sys, time\n"
+            "print('one', flush=True)\n"
+            "time.sleep(1.0)\n"
+            "print('two', flush=True)\n"
+            "print('warn', file=sys.stderr)\n",
+            server=server,
+        )
+        finished = time.monotonic()
+        self.assertEqual(out["stdout"], "one\ntwo\n")
+        messages = [message for _, _, message in sent]
+        self.assertEqual(messages[0], "one\n")
+        self.assertLess(sent[0][0] - started, finished - started - 0.5)  # before "two"
+        self.assertIn("two\n", "".join(messages))
+        self.assertIn("[stderr] warn\n", "".join(messages))
+        progress = [value for _, value, _ in sent]
+        self.assertEqual(progress, sorted(set(progress)))
+
+    async def test_no_notifications_without_a_progress_token(self):
+        server = _make_server()
+        server.server = MagicMock()
+        server.server.request_context.meta = None
+        self.assertIsNone(server._progress_reporter())
+        server.server.request_context.meta = MagicMock(progressToken=None)
+        self.assertIsNone(server._progress_reporter())
 
-        with (
-            _hermetic_chromium_cache(),
-            patch.object(_mod, "BrowserProfile", CapturingProfile),
-            patch.object(_mod, "BrowserSession", MagicMock(return_value=mock_session)),
-            patch.object(_mod, "get_default_profile", return_value={}),
-            patch.object(_mod, "get_default_llm", return_value={}),
-        ):
-            server._track_session = MagicMock()
-            asyncio.run(server._init_browser_session())
+    async def test_reporter_sends_to_the_calling_session(self):
+        server = _make_server()
+        server.server = MagicMock()
+        ctx = server.server.request_context
+        ctx.meta = MagicMock(progressToken="tok")
+        ctx.request_id = 7
+        ctx.session.send_progress_notification = AsyncMock()
+        await server._progress_reporter()(12, "hello\n")
+        ctx.session.send_progress_notification.assert_awaited_once_with(
+            "tok", 12, message="hello\n", related_request_id="7"
+        )
 
-        return captured
+    async def test_timeout_returns_the_output_so_far(self):
+        out = await self._run(
+            "import time\nprint('started', flush=True)\ntime.sleep(60)\n",
+            timeout_seconds=1,
+        )
+        self.assertEqual(out["exit_code"], -1)
+        self.assertIn("timed out", out["error"])
+        self.assertEqual(out["stdout"], "started\n")
 
-    def test_local_profile_uses_chromium_channel(self):
-        """profile must include channel='chromium' by default."""
-        captured = self._captured_profile()
-        self.assertEqual(
+
+class TestScriptScheduler(unittest.IsolatedAsyncioTestCase):
+    """Jobs start in submission order, never more than max_running at once."""
+
+    def _scheduler(self, max_running=2):
+        releases = {}
+        started = []
+
+        async def run(job):
+            started.append(job.id)
+            releases[job.id] = asyncio.get_running_loop().create_future()
+            return await releases[job.id]
+
+        return _mod._ScriptScheduler(run, max_running), started, releases
+
+    def _submit(self, scheduler, n):
+        return [
+            scheduler.submit(Path(f"/s{i}.py"), [], 10, [], _mod._ScriptOutput())
+            for i in range(n)
+        ]
+
+    async def test_fifo_behind_the_concurrency_limit(self):
+        scheduler, started, releases = self._scheduler(max_running=2)
+        jobs = self._submit(scheduler, 4)
+        await asyncio.sleep(0)
+        self.assertEqual(started, ["job-1", "job-2"])
+        self.assertEqual([j.state for j in jobs], ["running", "running", "queued", "queued"])
+        self.assertEqual(scheduler.status(jobs[3])["queue_position"], 2)
+
+        releases["job-2"].set_result(0)
+        await jobs[1].done.wait()
+        await asyncio.sleep(0)
+        self.assertEqual(started, ["job-1", "job-2", "job-3"])
+        self.assertEqual(scheduler.status(jobs[3])["queue_position"], 1)
+
+        releases["job-1"].set_result(1)
+        releases["job-3"].set_result(None)
+        await jobs[0].done.wait()
+        await asyncio.sleep(0)
+        releases["job-4"].set_result(0)
+        for job in jobs:
+            await job.done.wait()
+        self.assertEqual(
+            [j.state for j in jobs], ["failed", "succeeded", "timed_out", "succeeded"]
+        )
+        stats = scheduler.stats()
+        self.assertEqual((stats["running"], stats["queued"]), (0, 0))
+        self.assertEqual(stats["finished"], {"succeeded": 2, "failed": 1, "timed_out": 1})
+        self.assertEqual(stats["queue_wait_seconds"]["count"], 4)
+        self.assertEqual(stats["run_seconds"]["count"], 4)
+
+    async def test_cancelling_a_queued_job_never_runs_it(self):
+        scheduler, started, releases = self._scheduler(max_running=1)
+        first, second = self._submit(scheduler, 2)
+        await asyncio.sleep(0)
+        self.assertTrue(scheduler.cancel(second))
+        self.assertEqual(second.state, "cancelled")
+        releases["job-1"].set_result(0)
+        await first.done.wait()
+        await asyncio.sleep(0)
+        self.assertEqual(started, ["job-1"])
+        self.assertFalse(scheduler.cancel(first))  # already finished
+
+    async def test_cancelling_a_running_job_cancels_its_runner(self):
+        scheduler, _, _ = self._scheduler(max_running=1)
+        (job,) = self._submit(scheduler, 1)
+        await asyncio.sleep(0)
+        scheduler.cancel(job)
+        await job.done.wait()
+        self.assertEqual(job.state, "cancelled")
+        self.assertIsNotNone(job.status()["run_seconds"])
+
+    async def test_runner_errors_fail_the_job(self):
+        async def run(job):
+            raise RuntimeError("no interpreter")
+
+        scheduler = _mod._ScriptScheduler(run, 1)
+        (job,) = self._submit(scheduler, 1)
+        await job.done.wait()
+        self.assertEqual((job.state, job.error), ("failed", "no interpreter"))
+
+    async def test_only_the_newest_finished_jobs_are_kept(self):
+        async def run(job):
+            return 0
+
+        scheduler = _mod._ScriptScheduler(run, 4)
+        with patch.object(_mod, "_SCRIPT_JOBS_KEEP", 3):
+            for job in self._submit(scheduler, 5):
+                await job.done.wait()
+            self._submit(scheduler, 1)
+        self.assertEqual([j.id for j in scheduler.jobs()], ["job-3", "job-4", "job-5", "job-6"])
+
+
+class TestScriptJobTools(unittest.IsolatedAsyncioTestCase):
+    """browser_run_script's background jobs and their companion tools."""
+
+    def setUp(self):
+        import tempfile
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(_shutil.rmtree, self.tmp, ignore_errors=True)
+        home = _fake_home(create_profile_dir=False)
+        home.__enter__()
+        self.addCleanup(home.__exit__, None, None, None)
+        self.server = _make_server()
+
+    def _script(self, body: str, name: str = "job.py") -> str:
+        path = self.tmp / name
+        path.write_text(body)
+        return str(path)
+
+    async def _call(self, tool: str, **args):
+        return json.loads(await self.server._execute_tool(tool, args))
+
+    async def _wait(self, job_id: str) -> dict:
+        await self.server._script_jobs.get(job_id).done.wait()
+        return await self._call("browser_script_status", job_id=job_id)
+
+    async def test_background_run_returns_a_job_id_at_once(self):
+        started = time.monotonic()
+        job = await self._call(
+            "browser_run_script",
+            script_path=self._script("import time\ntime.sleep(1)\nprint('done')\n"),
+            background=True,
+        )
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(job["state"], "running")
+        status = await self._wait(job["job_id"])
+        self.assertEqual((status["state"], status["exit_code"]), ("succeeded", 0))
+        self.assertGreaterEqual(status["run_seconds"], 1)
+        out = await self._call("browser_script_output", job_id=job["job_id"])
+        self.assertEqual((out["stdout"], out["stderr"]), ("done\n", ""))
+
+    async def test_output_is_readable_while_the_job_runs(self):
+        job = await self._call(
+            "browser_run_script",
+            script_path=self._script("import time\nprint('early', flush=True)\ntime.sleep(30)\n"),
+            background=True,
+        )
+        for _ in range(100):
+            out = await self._call("browser_script_output", job_id=job["job_id"])
+            if out["stdout"]:
+                break
+            await asyncio.sleep(0.05)
+        self.assertEqual((out["state"], out["stdout"]), ("running", "early\n"))
+        await self._call("browser_script_cancel", job_id=job["job_id"])
+
+    async def test_cancel_kills_a_running_script(self):
+        pid_file = self.tmp / "pid"
+        job = await self._call(
+            "browser_run_script",
+            script_path=self._script(
+                "import os, sys, time\n"
+                f"open({str(pid_file)!r}, 'w').write(str(os.getpid()))\n"
+                "time.sleep(60)\n"
+            ),
+            background=True,
+        )
+        for _ in range(100):
+            if pid_file.exists() and pid_file.read_text():
+                break
+            await asyncio.sleep(0.05)
+        pid = int(pid_file.read_text())
+        out = await self._call("browser_script_cancel", job_id=job["job_id"])
+        self.assertTrue(out["cancelled"])
+        self.assertEqual(out["state"], "cancelled")
+        await asyncio.sleep(0.1)
+        with self.assertRaises(ProcessLookupError):
+            os.kill(pid, 0)
+
+    async def test_queued_jobs_wait_for_a_free_slot(self):
+        self.server._script_jobs.max_running = 1
+        slow = self._script("import time\ntime.sleep(0.5)\n", "slow.py")
+        first = await self._call("browser_run_script", script_path=slow, background=True)
+        second = await self._call("browser_run_script", script_path=slow, background=True)
+        self.assertEqual((second["state"], second["queue_position"]), ("queued", 1))
+        status = await self._wait(second["job_id"])
+        self.assertGreaterEqual(status["queued_seconds"], 0.4)
+        listing = await self._call("browser_script_status")
+        self.assertEqual([j["job_id"] for j in listing["jobs"]], [first["job_id"], second["job_id"]])
+        self.assertEqual(listing["scheduler"]["finished"], {"succeeded": 2})
+        report = json.loads(await self.server._handle_doctor({}))
+        self.assertEqual(report["script_jobs"]["max_running"], 1)
+
+    async def test_unknown_job_id_is_an_error(self):
+        out = await self.server._execute_tool("browser_script_output", {"job_id": "job-99"})
+        self.assertIn("no script job 'job-99'", out)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "rlimits are POSIX")
+    async def test_cpu_limit_stops_a_busy_script(self):
+        out = await self._call(
+            "browser_run_script",
+            script_path=self._script("while True:\n    pass\n"),
+            cpu_seconds=1,
+            timeout_seconds=30,
+        )
+        self.assertEqual((out["exit_code"], out["signal"]), (-signal.SIGXCPU, "SIGXCPU"))
+
+    @unittest.skipUnless(sys.platform.startswith("linux"), "RLIMIT_DATA bounds mmap on Linux")
+    async def test_memory_limit_fails_a_large_allocation(self):
+        out = await self._call(
+            "browser_run_script",
+            script_path=self._script("data = bytearray(512 << 20)\nprint('allocated')\n"),
+            memory_mb=256,
+        )
+        self.assertEqual(out["exit_code"], 1)
+        self.assertIn("MemoryError", out["stderr"])
+
+    @unittest.skipUnless(hasattr(os, "fork"), "rlimits are POSIX")
+    async def test_limits_are_set_in_the_child_not_before_exec(self):
+        spawned = []
+        real_exec = asyncio.create_subprocess_exec
+
+        async def exec_(*argv, **kwargs):
+            spawned.append(kwargs)
+            return await real_exec(*argv, **kwargs)
+
+        with patch.object(asyncio, "create_subprocess_exec", side_effect=exec_):
+            out = await self._call(
+                "browser_run_script",
+                script_path=self._script(
+                    "import resource, sys\n"
+                    "print(sys.argv[1:], resource.getrlimit(resource.RLIMIT_DATA)[0] >> 20)\n"
+                ),
+                args=["a", "b c"],
+                memory_mb=300,
+            )
+        self.assertEqual((out["exit_code"], out["stdout"]), (0, "['a', 'b c'] 300\n"))
+        self.assertNotIn("preexec_fn", spawned[0])
+
+    def test_rlimits_never_exceed_the_hard_limit(self):
+        import resource
+        with patch.object(resource, "getrlimit", return_value=(10, 20)):
+            limits = _mod._script_rlimits(60, 64)
+        self.assertEqual(limits, [("RLIMIT_CPU", 20, 20), ("RLIMIT_DATA", 20, 20)])
+        self.assertEqual(_mod._script_rlimits(0, 0), [])
+
+
+def _attachable_session(session_id: str = "live"):
+    """A primary BrowserSession stand-in with a CDP endpoint and a Target domain."""
+    session = _fake_browser_session(session_id)
+    session.cdp_url = "ws://127.0.0.1:9222/devtools/browser/abc"
+    target = session.cdp_client.send.Target
+    target.createTarget = AsyncMock(return_value={"targetId": "TAB-1"})
+    target.closeTarget = AsyncMock(return_value={})
+    target.getTargets = AsyncMock(return_value={"targetInfos": []})
+    return session
+
+
+class TestRunScriptAttachesToLiveBrowser(unittest.IsolatedAsyncioTestCase):
+    """
+    attach_browser hands the script the live browser's CDP endpoint and a tab
+    of its own, and keeps the session's idle and lifecycle state right while
+    the script holds it and after it lets go.
+    """
+
+    def setUp(self):
+        import tempfile
+        self.tmp = Path(tempfile.mkdtemp())
+        self.addCleanup(_shutil.rmtree, self.tmp, ignore_errors=True)
+        home = _fake_home(create_profile_dir=False)
+        home.__enter__()
+        self.addCleanup(home.__exit__, None, None, None)
+        self.server = _make_server()
+        self.session = _attachable_session()
+        self.server.browser_session = self.session
+        _track(self.server, self.session, last_activity=time.time() - _IDLE_LONGER_THAN_TIMEOUT)
+
+    def _script(self, body: str) -> str:
+        path = self.tmp / "attached.py"
+        path.write_text(body)
+        return str(path)
+
+    async def _run(self, body: str, **args):
+        return json.loads(
+            await self.server._handle_run_script({"script_path": self._script(body), **args})
+        )
+
+    async def test_script_gets_the_endpoint_and_its_own_tab(self):
+        out = await self._run(
+            "import os\n"
+            "print(os.environ['BROWSER_USE_CDP_URL'])\n"
+            "print(os.environ['BROWSER_USE_TARGET_ID'])\n",
+            attach_browser=True,
+        )
+        self.assertEqual(out["stdout"].split(), [self.session.cdp_url, "TAB-1"])
+        target = self.session.cdp_client.send.Target
+        target.createTarget.assert_awaited_once_with(
+            params={"url": "about:blank", "background": True}
+        )
+        target.closeTarget.assert_awaited_once_with(params={"targetId": "TAB-1"})
+        # The idle clock restarts when the script lets go.
+        last_activity = self.server.active_sessions["live"]["last_activity"]
+        self.assertLess(time.time() - last_activity, 5)
+        self.assertEqual(self.server._script_leases, {})
+
+    async def test_unattached_scripts_see_no_endpoint(self):
+        out = await self._run("import os\nprint(os.environ.get('BROWSER_USE_CDP_URL'))\n")
+        self.assertEqual(out["stdout"], "None\n")
+        self.session.cdp_client.send.Target.createTarget.assert_not_awaited()
+
+    async def test_idle_sweep_spares_a_browser_a_script_holds(self):
+        release = self.tmp / "release"
+        job = json.loads(
+            await self.server._handle_run_script(
+                {
+                    "script_path": self._script(
+                        "import os, time\n"
+                        f"while not os.path.exists({str(release)!r}):\n"
+                        "    time.sleep(0.02)\n"
+                    ),
+                    "attach_browser": True,
+                    "background": True,
+                }
+            )
+        )
+        for _ in range(100):
+            if self.server._script_leases:
+                break
+            await asyncio.sleep(0.02)
+        self.server.active_sessions["live"]["last_activity"] = time.time() - _IDLE_LONGER_THAN_TIMEOUT
+        with patch.object(_mod, "_reap_orphaned_profiles", MagicMock()):
+            await self.server._cleanup_expired_sessions()
+        self.assertIn("live", self.server.active_sessions)
+        self.session.kill.assert_not_awaited()
+
+        release.write_text("")
+        await self.server._script_jobs.get(job["job_id"]).done.wait()
+        self.assertEqual(self.server._script_leases, {})
+
+    async def test_a_browser_the_script_closed_is_closed_here_too(self):
+        self.session.cdp_client.send.Target.getTargets.side_effect = ConnectionError("closed")
+        await self._run("print('closing it')\n", attach_browser=True)
+        self.session.kill.assert_awaited_once()
+        self.assertNotIn("live", self.server.active_sessions)
+        self.assertIsNone(self.server.browser_session)
+
+    async def test_a_browser_is_started_when_there_is_none(self):
+        self.server.browser_session = None
+        self.server.active_sessions.clear()
+
+        async def start():
+            self.server.browser_session = self.session
+            _track(self.server, self.session)
+
+        self.server._init_browser_session = AsyncMock(side_effect=start)
+        out = await self._run("import os\nprint(os.environ['BROWSER_USE_TARGET_ID'])\n", attach_browser=True)
+        self.assertEqual(out["stdout"], "TAB-1\n")
+        self.server._init_browser_session.assert_awaited_once()
+
+
+_HAVE_FORK_SERVER = hasattr(os, "fork") and hasattr(__import__("socket"), "send_fds")
+
+
+async def _stop_fork_server(pool) -> None:
+    """close() and reap, so no transport outlives the test's event loop."""
+    pool.close()
+    if pool._proc is not None:
+        await pool._proc.wait()
+
+
+@unittest.skipUnless(_HAVE_FORK_SERVER, "fork server needs os.fork and SCM_RIGHTS")
+class TestScriptForkServer(unittest.IsolatedAsyncioTestCase):
+    """
+    BROWSER_USE_SCRIPT_POOL=1 runs browser_run_script scripts forked from a
+    warm interpreter. Which path ran a script must not be visible in the
+    result: the same exit code, stdout and stderr as `python script.py`.
+    """
+
+    async def asyncSetUp(self):
+        import tempfile
+        self.tmp = tempfile.mkdtemp()
+        self.addCleanup(_shutil.rmtree, self.tmp, ignore_errors=True)
+        # "json" stands in for browser_use: the stub-loaded module must not
+        # depend on the real library being importable.
+        self.pool = _mod._ScriptForkServer(preload=("json",))
+        self.addAsyncCleanup(_stop_fork_server, self.pool)
+        self.pool.start()
+        await self.pool._starting
+        self.assertTrue(self.pool.ready)
+
+    def _script(self, name: str, body: str) -> Path:
+        path = Path(self.tmp) / name
+        path.write_text(body)
+        return path
+
+    async def _cold(self, script: Path, args=()):
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, str(script), *args,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        stdout, stderr = await proc.communicate()
+        return proc.returncode, stdout, stderr
+
+    async def _warm(self, script: Path, args=(), timeout=30):
+        output = _mod._ScriptOutput()
+        code = await self.pool.run(script, list(args), timeout, output)
+        await output.finish()
+        return code, bytes(output.stdout.head), bytes(output.stderr.head)
+
+    async def _assert_same_as_cold(self, body: str, args=()):
+        script = self._script("probe.py", body)
+        warm = await self._warm(script, args)
+        self.assertEqual(warm, await self._cold(script, args))
+        return warm
+
+    async def test_exit_code_and_both_streams_match(self):
+        code, stdout, _ = await self._assert_same_as_cold(
+            "import sys\n"
+            "print('out', sys.argv[1:], __name__)\n"
+            "print('err', file=sys.stderr)\n"
+            "sys.exit(3)\n",
+            args=("a", "b c"),
+        )
+        self.assertEqual(code, 3)
+        self.assertIn(b"['a', 'b c'] __main__", stdout)
+
+    async def test_uncaught_exception_traceback_matches(self):
+        code, _, stderr = await self._assert_same_as_cold("raise ValueError('boom')\n")
+        self.assertEqual(code, 1)
+        self.assertNotIn(b"runpy", stderr)  # none of the fork server's frames
+
+    async def test_string_exit_goes_to_stderr(self):
+        code, _, stderr = await self._assert_same_as_cold("import sys\nsys.exit('bye')\n")
+        self.assertEqual((code, stderr), (1, b"bye\n"))
+
+    async def test_child_sees_callers_cwd_env_and_script_dir(self):
+        self._script("helper_mod.py", "VALUE = 'sibling'\n")
+        with patch.dict(os.environ, {"MAGUS_PROBE": "42"}):
+            _, stdout, _ = await self._assert_same_as_cold(
+                "import os, helper_mod\n"
+                "print(os.getcwd(), os.environ.get('MAGUS_PROBE'), helper_mod.VALUE)\n"
+            )
+        self.assertEqual(stdout.split()[1:], [b"42", b"sibling"])
+
+    async def test_rlimits_apply_to_the_forked_child(self):
+        script = self._script("big.py", "data = bytearray(512 << 20)\n")
+        output = _mod._ScriptOutput()
+        code = await self.pool.run(script, [], 30, output, _mod._script_rlimits(0, 256))
+        await output.finish()
+        self.assertEqual(code, 1)
+        self.assertIn(b"MemoryError", bytes(output.stderr.head))
+
+    async def test_timeout_kills_the_script(self):
+        script = self._script("slow.py", "import time\nprint('x', flush=True)\ntime.sleep(60)\n")
+        started = time.monotonic()
+        self.assertEqual(await self._warm(script, timeout=0.3), (None, b"x\n", b""))
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertEqual(self.pool.warm_runs, 0)
+
+    async def test_tool_uses_the_pool_once_ready(self):
+        server = _make_server()
+        server._script_pool = self.pool
+        script = self._script("ok.py", "print('hi')\n")
+        out = json.loads(await server._handle_run_script({"script_path": str(script)}))
+        self.assertEqual(out, {"exit_code": 0, "stdout": "hi\n", "stderr": ""})
+        self.assertEqual((self.pool.warm_runs, self.pool.cold_runs), (1, 0))
+        report = json.loads(await server._handle_doctor({}))
+        self.assertEqual(report["script_pool"]["warm_runs"], 1)
+
+    async def test_tool_runs_cold_while_pool_is_not_ready(self):
+        server = _make_server()
+        server._script_pool = self.pool
+        self.pool.close()
+        await asyncio.sleep(0.05)
+        self.assertFalse(self.pool.ready)
+        script = self._script("ok.py", "print('hi')\n")
+        out = json.loads(await server._handle_run_script({"script_path": str(script)}))
+        self.assertEqual(out["stdout"], "hi\n")
+        self.assertEqual((self.pool.warm_runs, self.pool.cold_runs), (0, 1))
+
+    async def test_fork_server_killed_mid_run_falls_back_to_cold(self):
+        server = _make_server()
+        server._script_pool = self.pool
+        started = Path(self.tmp) / "started"
+        script = self._script(
+            "once.py",
+            "import os, pathlib, time\n"
+            f"flag = pathlib.Path({str(started)!r})\n"
+            "if not flag.exists():\n"
+            "    flag.write_text(str(os.getpid()))\n"
+            "    time.sleep(60)\n"
+            "print('done')\n",
+        )
+        call = asyncio.ensure_future(server._handle_run_script({"script_path": str(script)}))
+        for _ in range(200):
+            if started.exists() and started.read_text():
+                break
+            await asyncio.sleep(0.05)
+        self.pool._proc.kill()
+        out = json.loads(await asyncio.wait_for(call, timeout=30))
+
+        self.assertEqual((out["exit_code"], out["stdout"]), (0, "done\n"))
+        self.assertIn("warm interpreter exited mid-run", out["stderr"])
+        self.assertEqual((self.pool.warm_runs, self.pool.cold_runs), (0, 1))
+        self.assertFalse(self.pool.ready)
+        # The warm run it replaced does not go on sleeping in the background.
+        orphan = int(started.read_text())
+        for _ in range(100):
+            try:
+                state = Path(f"/proc/{orphan}/stat").read_text().split()[2]
+            except OSError:
+                break
+            if state == "Z":
+                break
+            await asyncio.sleep(0.05)
+        else:
+            self.fail("the interrupted warm run is still running")
+
+    async def test_an_empty_reply_counts_as_a_lost_fork_server(self):
+        with self.assertRaises(ConnectionError):
+            _mod._ScriptForkServer._reply(b"", "pid")
+        with self.assertRaises(ConnectionError):
+            _mod._ScriptForkServer._reply(b'{"pi', "pid")
+        self.assertEqual(_mod._ScriptForkServer._reply(b'{"pid": 7}\n', "pid"), 7)
+
+    def test_browser_use_and_playwright_are_never_preloaded(self):
+        pool = _mod._ScriptForkServer(preload=("json", "browser_use", "playwright.async_api"))
+        self.assertEqual(pool.preload, ("json",))
+        self.assertFalse(
+            [name for name in _mod._SCRIPT_POOL_PRELOAD
+             if name.split(".")[0] in _mod._SCRIPT_POOL_NEVER_PRELOAD]
+        )
+
+    async def test_pool_is_off_by_default(self):
+        with patch.dict(os.environ, {}, clear=False):
+            os.environ.pop(_mod._SCRIPT_POOL_ENV, None)
+            self.assertFalse(_mod._script_pool_enabled())
+        with patch.dict(os.environ, {_mod._SCRIPT_POOL_ENV: "1"}):
+            self.assertTrue(_mod._script_pool_enabled())
+
+
+@unittest.skipUnless(_HAVE_FORK_SERVER, "fork server needs os.fork and SCM_RIGHTS")
+class TestScriptForkServerBenchmark(unittest.IsolatedAsyncioTestCase):
+    """
+    Cold vs warm latency of a script that imports a heavy library. pydantic
+    (one of the real preloads) is used when it is importable, else asyncio —
+    smaller, but the same shape: the warm path skips interpreter start-up and
+    the import. Prints the numbers; asserts only that warm wins.
+    """
+
+    async def test_warm_start_beats_cold_start(self):
+        import importlib.util
+        import tempfile
+        heavy = "pydantic" if importlib.util.find_spec("pydantic") else "asyncio"
+        pool = _mod._ScriptForkServer(preload=(heavy,))
+        self.addAsyncCleanup(_stop_fork_server, pool)
+        pool.start()
+        await pool._starting
+        self.assertTrue(pool.ready)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            script = Path(tmp) / "bench.py"
+            script.write_text(f"import {heavy}\nprint('ok')\n")
+
+            async def cold():
+                proc = await asyncio.create_subprocess_exec(
+                    sys.executable, str(script),
+                    stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+                )
+                await proc.communicate()
+
+            async def timed(run, rounds=5):
+                samples = []
+                for _ in range(rounds):
+                    started = time.perf_counter()
+                    await run()
+                    samples.append(time.perf_counter() - started)
+                return sorted(samples)[rounds // 2] * 1000
+
+            cold_ms = await timed(cold)
+            warm_ms = await timed(lambda: pool.run(script, [], 30, _mod._ScriptOutput()))
+
+        print(f"\nrun_script importing {heavy}: cold {cold_ms:.1f}ms, warm {warm_ms:.1f}ms (median of 5)")
+        self.assertLess(warm_ms, cold_ms)
+
+
+def _answering_cdp_client():
+    """A real cdp_use CDPClient whose socket answers every command with {}."""
+    from cdp_use.client import CDPClient
+
+    client = CDPClient("ws://unused")
+
+    class _Socket:
+        async def send(self, message):
+            client.pending_requests[json.loads(message)["id"]].set_result({})
+
+    client.ws = _Socket()
+    return client
+
+
+class TestToolMetrics(unittest.IsolatedAsyncioTestCase):
+    """Every tools/call is counted per tool: calls, errors, latency, CDP commands."""
+
+    def setUp(self):
+        self.server = _make_server()
+
+    async def _metrics(self, **args):
+        return json.loads(await self.server._execute_tool("browser_metrics", args))
+
+    async def test_calls_and_errors_are_counted_per_tool(self):
+        self.server._handle_focus = AsyncMock(return_value="Error: no such element")
+        self.server._handle_press_key = AsyncMock(side_effect=RuntimeError("boom"))
+        await self.server._execute_tool("browser_navigate", {"url": "about:blank"})
+        await self.server._execute_tool("browser_navigate", {"url": "about:blank"})
+        await self.server._execute_tool("browser_focus", {"selector": "#x"})
+        with self.assertRaises(RuntimeError):
+            await self.server._execute_tool("browser_press_key", {"key": "a"})
+
+        report = await self._metrics()
+        tools = report["tools"]
+        self.assertEqual((tools["browser_navigate"]["calls"], tools["browser_navigate"]["errors"]), (2, 0))
+        self.assertEqual((tools["browser_focus"]["calls"], tools["browser_focus"]["errors"]), (1, 1))
+        self.assertEqual((tools["browser_press_key"]["calls"], tools["browser_press_key"]["errors"]), (1, 1))
+        self.assertEqual((report["calls"], report["errors"]), (4, 2))
+        self.assertNotIn("browser_metrics", tools, "a report must not include its own call")
+
+    async def test_failed_paths_count_as_errors_whatever_their_text(self):
+        self.server._live_cdp_session = AsyncMock(return_value=MagicMock())
+        self.server._dispatch_keys = AsyncMock(side_effect=RuntimeError("socket closed"))
+        out = await self.server._execute_tool("browser_press_key", {"key": "a"})
+        self.assertEqual(out, "press_key failed: socket closed")
+        self.server._handle_focus = AsyncMock(return_value=json.dumps({"focused": True}))
+        await self.server._execute_tool("browser_focus", {"selector": "#x"})
+
+        tools = (await self._metrics())["tools"]
+        self.assertEqual(tools["browser_press_key"]["errors"], 1)
+        self.assertEqual(tools["browser_focus"]["errors"], 0)
+
+    def test_upstream_failure_texts_are_recognized(self):
+        for text in ("Error: boom", "Session abc not found", "Element with index 3 not found",
+                     "Agent task failed: x", "Unknown tool: y"):
+            self.assertTrue(_mod._is_tool_failure(text), text)
+        for text in ("Navigated to: https://example.com", '{"error_count": 0}', "Browser closed"):
+            self.assertFalse(_mod._is_tool_failure(text), text)
+
+    async def test_cdp_commands_are_attributed_to_the_calling_tool(self):
+        client = _answering_cdp_client()
+        late = []
+
+        async def evaluate(args):
+            await client.send.Runtime.evaluate(params={"expression": "1"})
+            await client.send.Runtime.evaluate(params={"expression": "2"})
+            await client.send.Input.dispatchKeyEvent(params={"type": "keyDown"})
+            # Spawned by the call, sending after it returned: not its cost.
+            late.append(asyncio.ensure_future(self._send_later(client)))
+            return "{}"
+
+        self.server._handle_evaluate = evaluate
+        await self.server._execute_tool("browser_evaluate", {"script": "1"})
+        await late[0]
+        await client.send.Runtime.evaluate(params={"expression": "outside any tool"})
+
+        stats = (await self._metrics())["tools"]["browser_evaluate"]
+        self.assertEqual(stats["cdp_commands"], 3)
+        self.assertEqual(stats["cdp_per_call"], 3)
+        self.assertEqual(
+            stats["cdp_methods"], {"Runtime.evaluate": 2, "Input.dispatchKeyEvent": 1}
+        )
+
+    async def test_each_send_is_counted_once(self):
+        # Every server built in this process instruments; only the first wraps.
+        _mod._instrument_cdp_client()
+        _make_server()
+        client = _answering_cdp_client()
+
+        async def evaluate(args):
+            await client.send.Runtime.evaluate(params={"expression": "1"})
+            return "{}"
+
+        self.server._handle_evaluate = evaluate
+        await self.server._execute_tool("browser_evaluate", {"script": "1"})
+        stats = (await self._metrics())["tools"]["browser_evaluate"]
+        self.assertEqual(stats["cdp_commands"], 1)
+
+    @staticmethod
+    async def _send_later(client):
+        await asyncio.sleep(0.01)
+        await client.send.Page.reload(params={})
+
+    async def test_concurrent_calls_keep_their_own_cdp_counts(self):
+        client = _answering_cdp_client()
+
+        async def evaluate(args):
+            for _ in range(args["n"]):
+                await client.send.Runtime.evaluate(params={"expression": "1"})
+                await asyncio.sleep(0)
+            return "{}"
+
+        self.server._handle_evaluate = evaluate
+        self.server._handle_focus = lambda args: evaluate({"n": 5})
+        await asyncio.gather(
+            self.server._execute_tool("browser_evaluate", {"n": 2}),
+            self.server._execute_tool("browser_focus", {"n": 5}),
+        )
+        tools = (await self._metrics())["tools"]
+        self.assertEqual(tools["browser_evaluate"]["cdp_commands"], 2)
+        self.assertEqual(tools["browser_focus"]["cdp_commands"], 5)
+
+    def test_percentiles_come_from_the_histogram(self):
+        metrics = _mod._ToolMetrics()
+        for ms in range(1, 101):
+            call = metrics.start("browser_evaluate")
+            call.started -= ms / 1000
+            metrics.finish(call, error=False)
+        latency = metrics.snapshot()["tools"]["browser_evaluate"]["latency_ms"]
+        # A bucket bound reads at most 2^(1/4) high, and never past the max.
+        for name, exact in (("p50", 50), ("p95", 95), ("p99", 99)):
+            self.assertGreaterEqual(latency[name], exact * 0.999, name)
+            self.assertLessEqual(latency[name], exact * 2 ** 0.25, name)
+        self.assertAlmostEqual(latency["max"], 100, delta=1)
+        self.assertLessEqual(latency["p99"], latency["max"])
+        self.assertAlmostEqual(latency["mean"], 50.5, delta=1)
+
+    async def test_reset_starts_counting_afresh(self):
+        await self.server._execute_tool("browser_navigate", {"url": "about:blank"})
+        before = await self._metrics(reset=True)
+        self.assertEqual(before["tools"]["browser_navigate"]["calls"], 1)
+        after = await self._metrics()
+        # Only the resetting call itself, which was still in flight.
+        self.assertEqual(list(after["tools"]), ["browser_metrics"])
+        self.assertEqual(after["calls"], 1)
+
+    async def test_periodic_dump_appends_snapshots_and_shutdown_writes_the_last(self):
+        with (
+            _fake_home(create_profile_dir=False) as (home, _),
+            patch.dict(os.environ, {"BROWSER_USE_METRICS_INTERVAL": "0.02"}),
+        ):
+            await self.server._start_cleanup_task()
+            self.addCleanup(self.server._metrics_task.cancel)
+            await self.server._execute_tool("browser_navigate", {"url": "about:blank"})
+            path = home / ".config" / "browseruse" / "magus" / "metrics.jsonl"
+            for _ in range(100):
+                if path.exists():
+                    break
+                await asyncio.sleep(0.02)
+            await asyncio.sleep(0.1)  # Nothing changed: no more lines.
+            lines = path.read_text().splitlines()
+            self.assertEqual(len(lines), 1)
+            first = json.loads(lines[0])
+            self.assertEqual(first["pid"], os.getpid())
+            self.assertEqual(first["tools"]["browser_navigate"]["calls"], 1)
+
+            self.server._metrics_task.cancel()
+            await self.server._execute_tool("browser_navigate", {"url": "about:blank"})
+            with patch.object(_mod, "_release_profile_dir", MagicMock()):
+                self.server._shutdown_sync()
+            last = json.loads(path.read_text().splitlines()[-1])
+            self.assertEqual(last["tools"]["browser_navigate"]["calls"], 2)
+
+    async def test_no_dump_unless_configured(self):
+        with patch.dict(os.environ, {"BROWSER_USE_METRICS_INTERVAL": ""}):
+            await self.server._start_cleanup_task()
+        self.assertIsNone(self.server._metrics_task)
+
+    def test_recording_costs_a_few_microseconds(self):
+        metrics = _mod._ToolMetrics()
+        rounds = 20000
+        started = time.perf_counter()
+        for _ in range(rounds):
+            metrics.finish(metrics.start("browser_evaluate"), error=False)
+        per_call_us = (time.perf_counter() - started) / rounds * 1e6
+        print(f"\ntool metrics: {per_call_us:.2f}us per recorded call", file=sys.stderr)
+        self.assertLess(per_call_us, 10)
+
+
+class TestSpanTracing(unittest.IsolatedAsyncioTestCase):
+    """BROWSER_USE_TRACE: nested spans, written as Chrome trace-event JSON."""
+
+    def setUp(self):
+        self.server = _make_server()
+        self.tracer = _mod._Tracer()
+        tracing = patch.object(_mod, "_tracer", self.tracer)
+        tracing.start()
+        self.addCleanup(tracing.stop)
+
+    def _spans(self, cat=None):
+        return [e for e in self.tracer.payload()["traceEvents"]
+                if e["ph"] == "X" and (cat is None or e["cat"] == cat)]
+
+    def _assert_nested_per_track(self, spans):
+        """Within one track, any two spans are nested or disjoint, never crossed."""
+        for a in spans:
+            for b in spans:
+                if a is b or a["tid"] != b["tid"]:
+                    continue
+                a_end, b_end = a["ts"] + a["dur"], b["ts"] + b["dur"]
+                crossed = a["ts"] < b["ts"] < a_end < b_end
+                self.assertFalse(crossed, f"{a['name']} and {b['name']} cross on one track")
+
+    @staticmethod
+    def _contains(outer, inner):
+        return (outer["tid"] == inner["tid"] and outer["ts"] <= inner["ts"]
+                and inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"])
+
+    async def test_cdp_sends_nest_inside_their_tool_call(self):
+        client = _answering_cdp_client()
+
+        async def evaluate(args):
+            await self.server._live_cdp_session()
+            await client.send.Runtime.evaluate(params={"expression": "1"})
+            await client.send.Runtime.evaluate(params={"expression": "2"})
+            return "{}"
+
+        self.server._handle_evaluate = evaluate
+        await self.server._execute_tool("browser_evaluate", {"script": "1"})
+
+        (tool,) = self._spans("tool")
+        self.assertEqual(tool["name"], "browser_evaluate")
+        children = [s for s in self._spans() if s is not tool]
+        self.assertEqual(
+            [s["name"] for s in children],
+            ["live_cdp_session", "Runtime.evaluate", "Runtime.evaluate"],
+        )
+        for child in children:
+            self.assertTrue(self._contains(tool, child), child["name"])
+
+    async def test_overlapping_work_takes_separate_tracks(self):
+        client = _answering_cdp_client()
+
+        async def keys(args):
+            # Pipelined: all sends in flight at once.
+            await asyncio.gather(*(
+                client.send.Input.dispatchKeyEvent(params={"type": "char"}) for _ in range(3)
+            ))
+            await asyncio.sleep(0.01)
+            return "{}"
+
+        self.server._handle_keyboard = keys
+        self.server._handle_focus = keys
+        await asyncio.gather(
+            self.server._execute_tool("browser_keyboard", {}),
+            self.server._execute_tool("browser_focus", {}),
+        )
+        spans = self._spans()
+        self._assert_nested_per_track(spans)
+        tools = self._spans("tool")
+        self.assertNotEqual(tools[0]["tid"], tools[1]["tid"])
+
+        # Once nothing is open, the next call goes back to the first track.
+        await self.server._execute_tool("browser_focus", {})
+        self.assertEqual(self._spans("tool")[-1]["tid"], 1)
+
+    async def test_browser_launch_is_broken_into_steps(self):
+        mock_session = MagicMock()
+        mock_session.start = AsyncMock(return_value=None)
+        self.server._track_session = MagicMock()
+        with (
+            _hermetic_chromium_cache(),
+            patch.object(_mod, "BrowserProfile", MagicMock()),
+            patch.object(_mod, "BrowserSession", MagicMock(return_value=mock_session)),
+            patch.object(_mod, "get_default_profile", return_value={}),
+            patch.object(_mod, "get_default_llm", return_value={}),
+            patch.object(_mod, "_record_profile_owner", AsyncMock()),
+        ):
+            await self.server._init_browser_session()
+
+        spans = {s["name"]: s for s in self._spans("browser")}
+        launch = spans.pop("init_browser_session")
+        self.assertEqual(
+            set(spans),
+            {"profile merge", "apply_chromium_executable_path", "await_profile_release",
+             "BrowserSession.start", "record_profile_owner", "tools, llm and file system"},
+        )
+        for step in spans.values():
+            self.assertTrue(self._contains(launch, step), step["name"])
+
+    def test_buffer_keeps_the_newest_events(self):
+        tracer = _mod._Tracer(max_events=10)
+        for i in range(25):
+            with tracer.span(f"s{i}", "test"):
+                pass
+        payload = tracer.payload()
+        names = [e["name"] for e in payload["traceEvents"] if e["ph"] == "X"]
+        self.assertEqual(names, [f"s{i}" for i in range(15, 25)])
+        self.assertEqual(payload["otherData"]["dropped_events"], 15)
+
+    async def test_off_by_default_records_nothing(self):
+        with patch.object(_mod, "_tracer", None):
+            self.assertIs(_mod._span("x", "tool"), _mod._NO_SPAN)
+            await self.server._execute_tool("browser_navigate", {"url": "about:blank"})
+        self.assertEqual(self._spans(), [])
+        with patch.dict(os.environ, {"BROWSER_USE_TRACE": ""}), patch.object(_mod, "_tracer", None):
+            _mod._start_tracing()
+            self.assertIsNone(_mod._tracer)
+
+    async def test_sweep_and_shutdown_write_the_trace_file(self):
+        with _fake_home(create_profile_dir=False) as (home, _):
+            with (
+                patch.object(_mod._maintenance_executor, "run", AsyncMock()),
+                patch.object(self.server, "_exit_if_parent_died", MagicMock()),
+            ):
+                await self.server._cleanup_expired_sessions()
+            path = home / ".config" / "browseruse" / "magus" / "diagnostics" / f"trace-{os.getpid()}.json"
+            swept = {e["name"] for e in json.loads(path.read_text())["traceEvents"]}
+            self.assertLessEqual({"expire idle sessions", "reap orphaned profiles"}, swept)
+
+            with patch.object(_mod, "_release_profile_dir", MagicMock()):
+                self.server._shutdown_sync()
+            events = json.loads(path.read_text())["traceEvents"]
+            self.assertIn("cleanup sweep", {e["name"] for e in events})
+            self.assertEqual(events[0]["ph"], "M")
+
+    def test_shutdown_writes_the_trace_after_releasing_the_profile(self):
+        order = []
+        with (
+            _fake_home() as (home, _),
+            patch.object(_mod, "_release_profile_dir", side_effect=lambda d: order.append("release")),
+            patch.object(_mod, "_save_trace", side_effect=lambda p: order.append("trace")),
+        ):
+            self.server._shutdown_sync()
+            self.assertEqual(order, ["release", "trace"])
+
+            # A shutdown that used up its kill deadline releases and leaves.
+            order.clear()
+            with patch.object(_mod, "_SHUTDOWN_KILL_DEADLINE", -1.0):
+                self.server._shutdown_sync()
+            self.assertEqual(order, ["release"])
+
+    def test_old_trace_files_are_pruned(self):
+        with _fake_home(create_profile_dir=False) as (home, _):
+            directory = home / ".config" / "browseruse" / "magus" / "diagnostics"
+            directory.mkdir(parents=True)
+            for i in range(_mod._TRACE_KEEP + 3):
+                old = directory / f"trace-{i}.json"
+                old.write_text("{}")
+                os.utime(old, (i, i))
+            _mod._save_trace(self.tracer.payload())
+            remaining = sorted(p.name for p in directory.glob("*.json"))
+            self.assertEqual(len(remaining), _mod._TRACE_KEEP)
+            self.assertIn(f"trace-{os.getpid()}.json", remaining)
+
+
+def _burn_cpu(seconds: float) -> None:
+    """Spin on the calling thread, holding the GIL, for `seconds`."""
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        sum(range(200))
+
+
+class TestToolProfiler(unittest.IsolatedAsyncioTestCase):
+    """Slow (or every Nth) tool calls are written out as collapsed stacks."""
+
+    def setUp(self):
+        home = _fake_home(create_profile_dir=False)
+        self.home, _ = home.__enter__()
+        self.addCleanup(home.__exit__, None, None, None)
+        self.server = _make_server()
+        self.diagnostics = self.home / ".config" / "browseruse" / "magus" / "diagnostics"
+
+    def _profiles(self):
+        return sorted(self.diagnostics.glob("profile-*.folded")) if self.diagnostics.exists() else []
+
+    @staticmethod
+    def _stacks(path):
+        stacks = {}
+        for line in path.read_text().splitlines():
+            stack, count = line.rsplit(" ", 1)
+            stacks[stack] = int(count)
+        return stacks
+
+    async def _burning(self, args):
+        _burn_cpu(args.get("seconds", 0.2))
+        return "{}"
+
+    async def test_slow_call_is_written_as_collapsed_stacks(self):
+        self.server._profiler = _mod._ToolProfiler(slow=0.1, every=None)
+        self.server._handle_evaluate = self._burning
+        with patch("sys.stderr", io.StringIO()):
+            await self.server._execute_tool("browser_evaluate", {"seconds": 0.3})
+            await self.server._execute_tool("browser_evaluate", {"seconds": 0.01})
+
+        (path,) = self._profiles()
+        self.assertIn("profile-browser_evaluate-", path.name)
+        stacks = self._stacks(path)
+        self.assertGreater(sum(stacks.values()), 10)
+        for stack in stacks:
+            self.assertTrue(stack.startswith("_MagusBrowserServerMixin._execute_tool ("), stack)
+        burning = sum(c for s, c in stacks.items() if "_burn_cpu (test_mcp_server.py:" in s)
+        self.assertGreater(burning / sum(stacks.values()), 0.5)
+
+    async def test_every_nth_call_is_kept_however_fast(self):
+        self.server._profiler = _mod._ToolProfiler(slow=None, every=2)
+        self.server._handle_evaluate = self._burning
+        with patch("sys.stderr", io.StringIO()):
+            for _ in range(4):
+                await self.server._execute_tool("browser_evaluate", {"seconds": 0.05})
+        self.assertEqual(len(self._profiles()), 2)
+
+    async def test_overlapping_calls_get_only_their_own_samples(self):
+        self.server._profiler = _mod._ToolProfiler(slow=0.05, every=None)
+
+        async def waiting(args):
+            await asyncio.sleep(0.3)
+            return "{}"
+
+        async def burning_soon(args):
+            await asyncio.sleep(0.01)
+            _burn_cpu(0.2)
+            return "{}"
+
+        self.server._handle_focus = waiting
+        self.server._handle_evaluate = burning_soon
+        with patch("sys.stderr", io.StringIO()):
+            await asyncio.gather(
+                self.server._execute_tool("browser_focus", {}),
+                self.server._execute_tool("browser_evaluate", {}),
+            )
+        profiles = {path.name.split("-")[1]: self._stacks(path) for path in self._profiles()}
+        self.assertTrue(any("_burn_cpu" in s for s in profiles["browser_evaluate"]))
+        # The waiting call ran on the loop only briefly, and never in _burn_cpu.
+        waited = profiles.get("browser_focus", {})
+        self.assertFalse(any("_burn_cpu" in s for s in waited))
+        self.assertLess(sum(waited.values()), sum(profiles["browser_evaluate"].values()) / 5)
+
+    def test_configured_from_env(self):
+        with patch.dict(os.environ, {"BROWSER_USE_PROFILE_SLOW_MS": "", "BROWSER_USE_PROFILE_EVERY": ""}):
+            self.assertIsNone(_mod._profiler_from_env())
+            self.assertIsNone(_make_server()._profiler)
+        with patch.dict(os.environ, {"BROWSER_USE_PROFILE_SLOW_MS": "1500", "BROWSER_USE_PROFILE_EVERY": "x"}):
+            profiler = _mod._profiler_from_env()
+            self.assertEqual((profiler.slow, profiler.every), (1.5, None))
+        with patch.dict(os.environ, {"BROWSER_USE_PROFILE_SLOW_MS": "", "BROWSER_USE_PROFILE_EVERY": "10"}):
+            profiler = _mod._profiler_from_env()
+            self.assertEqual((profiler.slow, profiler.every), (None, 10))
+
+    def test_diagnostics_live_outside_the_reaped_profiles_tree(self):
+        profiles_root = _mod._session_profile_dir(os.getpid()).parent
+        diagnostics = _mod._diagnostics_dir()
+        self.assertFalse(diagnostics.is_relative_to(profiles_root))
+        self.assertFalse(profiles_root.is_relative_to(diagnostics))
+
+    async def test_old_profiles_are_pruned(self):
+        self.server._profiler = _mod._ToolProfiler(slow=None, every=1)
+        self.server._handle_evaluate = self._burning
+        with (
+            patch.object(_mod, "_PROFILE_KEEP", 2),
+            patch("sys.stderr", io.StringIO()),
+        ):
+            for _ in range(4):
+                await self.server._execute_tool("browser_evaluate", {"seconds": 0.03})
+        self.assertEqual(len(self._profiles()), 2)
+
+
+
+def _load_fake_cdp_server():
+    path = Path(__file__).parent / "benchmarks" / "fake_cdp_server.py"
+    spec = importlib.util.spec_from_file_location("_fake_cdp_server", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestOverFakeCDPEndpoint(unittest.IsolatedAsyncioTestCase):
+    """
+    The page tools over a real websocket to benchmarks/fake_cdp_server.py:
+    framing, JSON both ways and cdp_use's reader task all run, only Chromium
+    is missing. _FakeCDPSession answers in-process and cannot show whether
+    calls overlap on the wire.
+    """
+
+    async def _connect(self, **settings):
+        from cdp_use.client import CDPClient
+
+        fake = _load_fake_cdp_server()
+        self.cdp = await fake.FakeCDPServer(**settings).start()
+        self.addAsyncCleanup(self.cdp.stop)
+        client = CDPClient(self.cdp.ws_url)
+        await client.start()
+        self.addAsyncCleanup(client.stop)
+
+        target = fake.PAGE_TARGET_ID
+        self.cdp_session = MagicMock(cdp_client=client, session_id=f"S-{target}", target_id=target)
+        bs = MagicMock(name="browser_session")
+        bs.id = "live-session"
+        bs.agent_focus_target_id = target
+        bs.session_manager._target_sessions = {target: {self.cdp_session.session_id}}
+        bs.get_or_create_cdp_session = AsyncMock(return_value=self.cdp_session)
+        self.server = _make_server()
+        self.server.browser_session = bs
+        self.server._update_session_activity = MagicMock()
+
+    async def test_page_tools_round_trip(self):
+        await self._connect()
+        out = await self.server._execute_tool("browser_evaluate", {"script": "return 1 + 1"})
+        self.assertEqual(json.loads(out)["result"], 2)
+        out = await self.server._execute_tool("browser_keyboard", {"keys": ["a", "Meta+a"]})
+        self.assertFalse(out.startswith("Error"), out)
+        self.assertGreaterEqual(self.cdp.commands["Input.dispatchKeyEvent"], 4)
+
+        cookies = [{"name": f"c{i}", "value": "v", "domain": "example.com", "path": "/"} for i in range(3)]
+        self.assertEqual(await self.server._set_cookies(self.cdp_session, cookies), [])
+        self.assertEqual(sorted(c["name"] for c in self.cdp.cookies.values()), ["c0", "c1", "c2"])
+
+    async def test_large_results_arrive_whole(self):
+        await self._connect(payload_bytes=2_000_000)
+        out = await self.server._execute_tool("browser_evaluate", {"script": "return big"})
+        self.assertIn("x" * 1000, out)
+        self.assertFalse(out.startswith("Error"), out[:200])
+
+    async def test_concurrent_calls_overlap_on_the_wire(self):
+        latency = 0.2
+        await self._connect(latency=latency)
+        started = time.perf_counter()
+        outs = await asyncio.gather(*(
+            self.server._execute_tool("browser_evaluate", {"script": f"return {i}"})
+            for i in range(8)
+        ))
+        elapsed = time.perf_counter() - started
+        self.assertEqual(sorted(json.loads(out)["result"] for out in outs), [2] * 8)
+        self.assertGreater(self.cdp.max_in_flight, 1)
+        self.assertLess(elapsed, 4 * latency, f"8 calls took {elapsed:.2f}s: serialized?")
+
+    async def test_unanswered_commands_fail_loudly(self):
+        await self._connect()
+        with self.assertRaises(RuntimeError) as ctx:
+            await self.cdp_session.cdp_client.send.DOM.getDocument(session_id="S")
+        self.assertIn("wasn't found", str(ctx.exception))
+
+
+# ---------------------------------------------------------------------------
+# Test 7 (v1.2.0): Local sessions force Playwright's bundled Chromium
+# ---------------------------------------------------------------------------
+
+class TestChromiumChannel(unittest.TestCase):
+    """
+    Local sessions must pass channel='chromium' so browser-use launches
+    Playwright's bundled Chromium instead of the user's real Chrome.app
+    (which caused macOS link-hijack / focus-steal).
+
+    The setting alone does not achieve that — see TestProfileCarriesResolvedBinary
+    for the executable_path that does. It is still asserted here because a user
+    config may deliberately override it, which is what opts a profile out of our
+    binary resolution.
+    """
+
+    def _captured_profile(self):
+        server = _make_server()
+        captured = {}
+
+        class CapturingProfile:
+            def __init__(self, **kwargs):
+                captured.update(kwargs)
+
+        mock_session = MagicMock()
+        mock_session.start = AsyncMock(return_value=None)
+
+        with (
+            _hermetic_chromium_cache(),
+            patch.object(_mod, "BrowserProfile", CapturingProfile),
+            patch.object(_mod, "BrowserSession", MagicMock(return_value=mock_session)),
+            patch.object(_mod, "get_default_profile", return_value={}),
+            patch.object(_mod, "get_default_llm", return_value={}),
+        ):
+            server._track_session = MagicMock()
+            asyncio.run(server._init_browser_session())
+
+        return captured
+
+    def test_local_profile_uses_chromium_channel(self):
+        """profile must include channel='chromium' by default."""
+        captured = self._captured_profile()
+        self.assertEqual(
             captured.get("channel"),
             "chromium",
             f"Local profile must force channel='chromium'. Got: {captured.get('channel')!r}",
@@ -2331,7 +4471,7 @@ class TestShutdownStaticChecks(unittest.TestCase):
         tree = ast.parse(source)
         segments = []
         for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef) and node.name == "MagusBrowserServer":
+            if isinstance(node, ast.ClassDef) and node.name == "_MagusBrowserServerMixin":
                 for item in node.body:
                     if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name in (
                         "_shutdown_sync",
@@ -2384,7 +4524,6 @@ class TestShutdownStaticChecks(unittest.TestCase):
 # guard constructs a REAL BrowserProfile.
 # ---------------------------------------------------------------------------
 
-import contextlib  # noqa: E402
 import io  # noqa: E402
 import shutil as _shutil  # noqa: E402
 import tempfile as _tempfile  # noqa: E402
@@ -2886,6 +5025,101 @@ class TestResolveChromiumBinary(_TempDirMixin):
         )
 
 
+class TestChromiumBinaryMemo(_TempDirMixin):
+    """
+    Resolution runs on every session launch and in browser_doctor, and a glob
+    over a large (or NFS-mounted) Playwright cache is not free. The answer is
+    memoized — but never past a change that could alter it.
+    """
+
+    def _counting_glob(self):
+        return patch.object(_mod.glob, "glob", side_effect=_mod.glob.glob)
+
+    def test_repeat_resolution_does_not_glob(self):
+        cache = self._tmpdir()
+        _make_fake_chromium(cache, 1234, "linux")
+
+        with (
+            _chromium_env(cache_root=cache),
+            patch.object(sys, "platform", "linux"),
+            self._counting_glob() as globbed,
+        ):
+            first = _mod._resolve_chromium_binary()
+            second = _mod._resolve_chromium_binary()
+
+        self.assertEqual(first, second)
+        self.assertEqual(globbed.call_count, 1)
+
+    def test_new_revision_in_the_cache_root_is_picked_up(self):
+        cache = self._tmpdir()
+        _make_fake_chromium(cache, 999, "linux")
+
+        with _chromium_env(cache_root=cache), patch.object(sys, "platform", "linux"):
+            self.assertIn("chromium-999", _mod._resolve_chromium_binary())
+            _make_fake_chromium(cache, 1234, "linux")
+            # Coarse-timestamp filesystems could leave the mtime unchanged.
+            os.utime(cache, ns=(0, cache.stat().st_mtime_ns + 1_000_000_000))
+            resolved = _mod._resolve_chromium_binary()
+
+        self.assertIn("chromium-1234", resolved)
+
+    def test_changed_environment_invalidates(self):
+        first_cache, second_cache = self._tmpdir(), self._tmpdir()
+        _make_fake_chromium(first_cache, 1234, "linux")
+        _make_fake_chromium(second_cache, 1234, "linux")
+        override = self._tmpdir() / "ms-playwright-chromium"
+        override.write_text("#!/bin/sh\nexit 0\n")
+
+        with patch.object(sys, "platform", "linux"):
+            with _chromium_env(cache_root=first_cache):
+                first = _mod._resolve_chromium_binary()
+            with _chromium_env(cache_root=second_cache):
+                second = _mod._resolve_chromium_binary()
+            with _chromium_env(cache_root=second_cache, chrome_executable=override):
+                third = _mod._resolve_chromium_binary()
+
+        self.assertTrue(first.startswith(str(first_cache)))
+        self.assertTrue(second.startswith(str(second_cache)))
+        self.assertEqual(third, str(override))
+
+    def test_deleted_binary_is_not_served_from_the_memo(self):
+        cache = self._tmpdir()
+        _make_fake_chromium(cache, 999, "linux")
+        newest = _make_fake_chromium(cache, 1234, "linux")
+
+        with _chromium_env(cache_root=cache), patch.object(sys, "platform", "linux"):
+            self.assertEqual(_mod._resolve_chromium_binary(), str(newest))
+            newest.unlink()  # Inside chromium-1234/: the root's mtime is unchanged.
+            resolved = _mod._resolve_chromium_binary()
+
+        self.assertIn("chromium-999", resolved)
+
+    def test_startup_warm_up_fills_the_memo_off_thread(self):
+        cache = self._tmpdir()
+        expected = _make_fake_chromium(cache, 1234, "linux")
+        threads: list = []
+        real_thread = threading.Thread
+
+        def recording_thread(*args, **kwargs):
+            thread = real_thread(*args, **kwargs)
+            threads.append(thread)
+            return thread
+
+        with (
+            _chromium_env(cache_root=cache),
+            patch.object(sys, "platform", "linux"),
+            patch.object(_mod.threading, "Thread", side_effect=recording_thread),
+        ):
+            _mod._warm_chromium_binary_cache()
+            threads[0].join(5)
+            self.assertTrue(threads[0].daemon, "the warm-up must never hold up exit")
+            with self._counting_glob() as globbed:
+                resolved = _mod._resolve_chromium_binary()
+
+        self.assertEqual(resolved, str(expected))
+        globbed.assert_not_called()
+
+
 # ---------------------------------------------------------------------------
 # Test 13b: _copy_profile guard — REAL BrowserProfile, no CapturingProfile
 # ---------------------------------------------------------------------------
@@ -3000,7 +5234,7 @@ class TestReaperHandlesNewProfilePrefix(_TempDirMixin):
         # terminated. The cmdline names the directory being swept, which is what
         # production looks like: browser-use records the same absolute path the
         # reaper then walks.
-        orphan_chrome = MagicMock(name="orphan_chrome")
+        orphan_chrome = _reapable_process("orphan_chrome")
         orphan_chrome.info = {
             "pid": 4242,
             "cmdline": ["/fake/chromium", f"--user-data-dir={dead_dir}"],
@@ -3056,7 +5290,7 @@ class TestReaperSweepsBothProfilePrefixes(_TempDirMixin):
         browser records: browser-use passes the user_data_dir it was given, and
         the reaper walks that same directory.
         """
-        proc = MagicMock(name=f"chrome-{profile_dir.name}")
+        proc = _reapable_process(f"chrome-{profile_dir.name}")
         proc.info = {
             "pid": pid,
             "cmdline": ["/fake/chromium", f"--user-data-dir={profile_dir}"],
@@ -3282,7 +5516,7 @@ class TestReaperMatchesUserDataDirArgument(_TempDirMixin):
 
     @staticmethod
     def _proc(pid: int, cmdline: list, label: str = "chrome") -> MagicMock:
-        proc = MagicMock(name=f"{label}-{pid}")
+        proc = _reapable_process(f"{label}-{pid}")
         proc.info = {"pid": pid, "cmdline": list(cmdline)}
         return proc
 
@@ -3689,7 +5923,7 @@ class TestReaperNeverReachesAnotherHome(_TempDirMixin):
 
     @staticmethod
     def _proc(pid: int, cmdline: list, label: str = "chrome") -> MagicMock:
-        proc = MagicMock(name=f"{label}-{pid}")
+        proc = _reapable_process(f"{label}-{pid}")
         proc.info = {"pid": pid, "cmdline": list(cmdline)}
         return proc
 
@@ -4262,6 +6496,8 @@ class TestPeriodicOrphanReaping(unittest.TestCase):
             started.append(self)
 
         with (
+            # No tool catalog in an empty HOME: main() takes the eager path.
+            _fake_home(create_profile_dir=False),
             patch.object(_mod, "_reap_orphaned_profiles", MagicMock()),
             patch.object(_mod, "_install_shutdown_handlers", MagicMock()),
             patch.object(_mod.MagusBrowserServer, "_start_cleanup_task", recording_start),
@@ -4374,7 +6610,7 @@ class TestAutoCleanupStaticChecks(unittest.TestCase):
         cls.methods: dict = {}
         cls.functions: dict = {}
         for node in ast.walk(tree):
-            if isinstance(node, ast.ClassDef) and node.name == "MagusBrowserServer":
+            if isinstance(node, ast.ClassDef) and node.name == "_MagusBrowserServerMixin":
                 for item in node.body:
                     if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
                         cls.methods[item.name] = ast.get_source_segment(source, item) or ""
@@ -4396,6 +6632,13 @@ class TestAutoCleanupStaticChecks(unittest.TestCase):
             "browser and untracks the session.",
         )
 
+    def test_list_sessions_override_delegates_to_super(self):
+        self.assertIn(
+            "super()._list_sessions",
+            self._method("_list_sessions"),
+            "The override must delegate: upstream owns the listing's format.",
+        )
+
     def test_cleanup_cycle_override_delegates_to_super(self):
         self.assertIn(
             "super()._cleanup_expired_sessions",
@@ -4421,6 +6664,1511 @@ class TestAutoCleanupStaticChecks(unittest.TestCase):
             )
 
 
+# ---------------------------------------------------------------------------
+# Test 15: warm browser pool (BROWSER_USE_POOL_SIZE)
+#
+# A cold session pays Chromium's launch inside the first browser tool call.
+# The pool launches browsers in the background after the MCP handshake and
+# hands a started one to whichever path would otherwise launch it cold.
+# ---------------------------------------------------------------------------
+
+
+def _startable_session(name: str = "pooled"):
+    """An unstarted BrowserSession stand-in with awaitable start()/kill()."""
+    session = MagicMock(name=name)
+    session.id = name
+    session.start = AsyncMock(return_value=None)
+    session.kill = AsyncMock(return_value=None)
+    session._local_browser_watchdog._subprocess = None
+    return session
+
+
+class TestWarmBrowserPool(unittest.IsolatedAsyncioTestCase):
+    """The pool itself: slots, refills, hit/miss accounting, shutdown."""
+
+    def _pool(self, size: int):
+        created: list = []
+
+        def create(profile_dir):
+            session = _startable_session(f"pooled-{len(created) + 1}")
+            created.append((session, profile_dir))
+            return session
+
+        return _mod._BrowserPool(size, create, pid=4242), created
+
+    async def test_disabled_pool_never_launches_or_counts(self):
+        pool, created = self._pool(0)
+        pool.top_up()
+        self.assertIsNone(pool.checkout())
+        self.assertEqual(created, [])
+        self.assertEqual((pool.hits, pool.misses), (0, 0))
+
+    async def test_top_up_launches_one_browser_per_slot_dir(self):
+        pool, created = self._pool(2)
+        pool.top_up()
+        pool.top_up()  # idempotent: in-flight launches count toward the size
+        await asyncio.sleep(0)
+
+        self.assertEqual(len(created), 2)
+        dirs = [profile_dir.name for _, profile_dir in created]
+        self.assertEqual(
+            dirs,
+            [f"{_NEW_SESSION_PREFIX}4242-1", f"{_NEW_SESSION_PREFIX}4242-2"],
+            "every pooled browser needs its own PID-scoped profile directory",
+        )
+        for session, _ in created:
+            session.start.assert_awaited_once()
+        self.assertEqual(pool.stats()["ready"], 2)
+        self.assertEqual(pool.stats()["launch_seconds"]["count"], 2)
+        self.assertEqual(pool.next_slot, 3)
+
+    async def test_checkout_is_a_hit_then_refills(self):
+        pool, created = self._pool(1)
+        pool.top_up()
+        await asyncio.sleep(0)
+
+        entry = pool.checkout()
+        self.assertIs(entry[0], created[0][0])
+        self.assertEqual(pool.hits, 1)
+        await asyncio.sleep(0)
+        self.assertEqual(len(created), 2, "a checkout must schedule the replacement")
+        self.assertEqual(pool.stats()["ready"], 1)
+
+    async def test_a_browser_that_died_waiting_is_killed_and_its_slot_released(self):
+        pool, created = self._pool(1)
+        dead = _startable_session("dead")
+        dead._local_browser_watchdog._subprocess = MagicMock(is_running=MagicMock(return_value=False))
+        with _fake_home() as (_, profile_dir):
+            slot = profile_dir.parent / f"{profile_dir.name}-1"
+            slot.mkdir()
+            pool._idle.append((dead, slot))
+
+            self.assertIsNone(pool.checkout())
+            await asyncio.gather(*pool._tasks)
+            slot_left = slot.exists()
+
+        dead.kill.assert_awaited_once()
+        self.assertFalse(slot_left, "a dead browser's slot must not wait for the idle sweep")
+        self.assertEqual((pool.misses, pool.stats()["dead_discarded"]), (1, 1))
+        self.assertEqual(len(created), 1, "the refill still runs")
+
+    async def test_empty_pool_is_a_miss(self):
+        pool, _ = self._pool(1)
+        self.assertIsNone(pool.checkout())
+        self.assertEqual(pool.misses, 1)
+
+    async def test_a_failed_launch_is_counted_not_retried_in_a_loop(self):
+        pool, created = self._pool(1)
+        pool._create = lambda profile_dir: (_ for _ in ()).throw(RuntimeError("no chromium"))
+        with contextlib.redirect_stderr(io.StringIO()):
+            pool.top_up()
+        self.assertEqual(pool.launch_failures, 1)
+        self.assertEqual(pool.stats()["launching"], 0)
+
+    async def test_close_hands_back_ready_and_launching_browsers(self):
+        pool, created = self._pool(2)
+        pool.top_up()
+        await asyncio.sleep(0)
+        pool.checkout()  # schedules a third, still launching
+
+        sessions = pool.close()
+        self.assertEqual(len(sessions), 2, "one ready + one launching")
+        self.assertIsNone(pool.checkout(), "a closed pool hands nothing out")
+
+    async def test_reserved_dirs_cover_ready_and_launching_slots(self):
+        pool, created = self._pool(1)
+        pool.top_up()
+        self.assertEqual(pool.reserved_profile_dirs(), {created[0][1]})
+        await asyncio.sleep(0)
+        self.assertEqual(pool.reserved_profile_dirs(), {created[0][1]})
+
+
+class _CookieCDPSession(_FakeCDPSession):
+    """
+    A fake CDP session with a cookie jar. Storage.setCookies rejects the whole
+    batch if any cookie is named in `bad`, as Chrome does; Network.setCookie
+    rejects just those. Every call waits `rtt`, like a remote browser.
+    """
+
+    def __init__(self, bad=(), rtt=0.0, storage=True):
+        super().__init__()
+        self.jar = []
+        session = self
+        recorder = self.cdp_client
+
+        async def _reply(path, params, session_id):
+            recorder.calls.append((path, params, session_id))
+            await asyncio.sleep(rtt)
+            if path == "Storage.setCookies":
+                if any(c["name"] in bad for c in params["cookies"]):
+                    raise RuntimeError("Invalid cookie fields")
+                session.jar.extend(params["cookies"])
+            elif path == "Network.setCookie":
+                if params["name"] in bad:
+                    raise RuntimeError("Invalid cookie fields")
+                session.jar.append(params)
+            elif path == "Storage.getCookies":
+                if not storage:
+                    raise RuntimeError("'Storage.getCookies' wasn't found")
+                return {"cookies": session.jar}
+            elif path == "Network.getCookies":
+                return {"cookies": session.jar[:1]}
+            return {}
+
+        class _Domain:
+            def __init__(self, domain):
+                self._domain = domain
+
+            def __getattr__(self, method):
+                async def _call(params=None, session_id=None):
+                    return await _reply(f"{self._domain}.{method}", params or {}, session_id)
+                return _call
+
+        self.cdp_client.send = MagicMock(
+            Storage=_Domain("Storage"), Network=_Domain("Network"), Target=_Domain("Target")
+        )
+
+
+class TestBulkCookies(unittest.IsolatedAsyncioTestCase):
+    """
+    Import sets every cookie in one browser-wide Storage.setCookies instead of
+    one awaited Network.setCookie each; export reads the whole browser's jar.
+    Both report how long the cookie traffic took.
+    """
+
+    def _exported(self, n):
+        return [
+            {"name": f"c{i}", "value": "v", "domain": ".example.com", "path": "/",
+             "expires": -1, "size": 3, "session": True, "httpOnly": False}
+            for i in range(n)
+        ]
+
+    async def _import(self, cdp, cookies):
+        server = _make_server()
+        session = _startable_session("imported")
+        session.get_or_create_cdp_session = AsyncMock(return_value=cdp)
+        server._browser_pool = MagicMock()
+        server._browser_pool.checkout.return_value = (session, Path("/tmp/slot"))
+        with _fake_home(create_profile_dir=False) as (home, _):
+            src = home / "session.json"
+            src.write_text(json.dumps({"cookies": cookies, "url": "https://example.com"}))
+            return json.loads(await server._handle_import_session({"import_path": str(src)}))
+
+    async def test_import_is_one_browser_wide_call(self):
+        cdp = _CookieCDPSession()
+        out = await self._import(cdp, self._exported(300))
+
+        self.assertEqual([c[0] for c in cdp.cdp_client.calls], ["Storage.setCookies"])
+        _, params, session_id = cdp.cdp_client.calls[0]
+        self.assertIsNone(session_id)  # The browser target, not the page.
+        self.assertEqual(len(params["cookies"]), 300)
+        self.assertEqual(
+            params["cookies"][0],
+            {"name": "c0", "value": "v", "domain": ".example.com", "path": "/", "httpOnly": False},
+        )
+        self.assertEqual(out["cookies_imported"], 300)
+        self.assertEqual(out["cookies_failed"], [])
+        self.assertIn("cookies_ms", out)
+
+    async def test_rejected_batch_is_replayed_per_cookie_and_names_the_bad(self):
+        cdp = _CookieCDPSession(bad={"c2"})
+        out = await self._import(cdp, self._exported(4) + ["junk"])
+
+        self.assertEqual(
+            [c[0] for c in cdp.cdp_client.calls],
+            ["Storage.setCookies"] + ["Network.setCookie"] * 4,
+        )
+        self.assertEqual(sorted(c["name"] for c in cdp.jar), ["c0", "c1", "c3"])
+        self.assertEqual(out["cookies_imported"], 3)
+        self.assertEqual(
+            out["cookies_failed"],
+            [
+                {"name": None, "domain": None, "error": "not a cookie"},
+                {"name": "c2", "domain": ".example.com", "error": "Invalid cookie fields"},
+            ],
+        )
+
+    async def test_export_reads_every_cookie_in_the_browser(self):
+        server = _make_server()
+        cdp = _CookieCDPSession()
+        cdp.jar = self._exported(3)
+        session = MagicMock()
+        session.get_or_create_cdp_session = AsyncMock(return_value=cdp)
+        session.session_manager = _FakeSessionManager({"T1": ("https://example.com/", "Example")})
+        session.agent_focus_target_id = "T1"
+        server.active_sessions["s"] = {"session": session}
+        with _fake_home(create_profile_dir=False) as (home, _):
+            out = json.loads(
+                await server._handle_export_session({"session_id": "s", "output_path": str(home / "o.json")})
+            )
+            written = _mod._read_snapshot(home / "o.json")
+
+        self.assertEqual(cdp.cdp_client.calls[0][:2], ("Storage.getCookies", {}))
+        self.assertNotIn("Network.getCookies", [c[0] for c in cdp.cdp_client.calls])
+        self.assertEqual(len(written["cookies"]), 3)
+        self.assertEqual(out["cookies_count"], 3)
+        self.assertEqual(out["url"], "https://example.com/")
+        self.assertIn("cookies_ms", out)
+
+    async def test_export_falls_back_to_page_cookies(self):
+        cdp = _CookieCDPSession(storage=False)
+        cdp.jar = self._exported(3)
+        cookies = await _mod.MagusBrowserServer._get_all_cookies(cdp)
+        self.assertEqual(len(cookies), 1)
+        self.assertEqual(cdp.cdp_client.calls[-1][2], cdp.session_id)
+
+    async def test_bulk_import_beats_one_round_trip_per_cookie(self):
+        """300 cookies at a 5ms round trip: ~1.5s one by one, one RTT in bulk."""
+        cookies = self._exported(300)
+
+        cdp = _CookieCDPSession(rtt=0.005)
+        started = time.perf_counter()
+        for cookie in cookies:
+            await cdp.cdp_client.send.Network.setCookie(params=cookie, session_id=cdp.session_id)
+        serial = time.perf_counter() - started
+
+        bulk = (await self._import(_CookieCDPSession(rtt=0.005), cookies))["cookies_ms"] / 1000
+        print(
+            f"\n300-cookie import @5ms rtt: per-cookie {serial * 1000:.0f}ms | "
+            f"bulk {bulk * 1000:.0f}ms",
+            file=sys.stderr,
+        )
+        self.assertLess(bulk * 10, serial)
+
+
+class _FakeSessionManager:
+    """
+    browser-use's SessionManager as _page_metadata reads it: targets with a
+    url and title, and per-target CDP sessions carrying `_lifecycle_events`.
+    """
+
+    def __init__(self, targets=None, lifecycle=None):
+        from types import SimpleNamespace
+
+        self._ns = SimpleNamespace
+        self.targets = {}  # target_id -> SimpleNamespace(target_id, url, title)
+        self.lifecycle = {}  # target_id -> deque of {"name": ...}
+        for target_id, (url, title) in (targets or {}).items():
+            self.add(target_id, url, title, (lifecycle or {}).get(target_id))
+
+    def add(self, target_id, url, title="", events=None):
+        self.targets[target_id] = self._ns(target_id=target_id, url=url, title=title)
+        self.lifecycle[target_id] = deque({"name": name} for name in events or ())
+
+    def get_target(self, target_id):
+        return self.targets.get(target_id)
+
+    def get_all_page_targets(self):
+        return list(self.targets.values())
+
+    def get_all_sessions_for_target(self, target_id):
+        if target_id not in self.targets:
+            return []
+        return [self._ns(_lifecycle_events=self.lifecycle[target_id])]
+
+
+class TestPageMetadata(unittest.IsolatedAsyncioTestCase):
+    """
+    Page URL, title and load state come from what browser-use's own CDP event
+    handlers keep — never from get_browser_state_summary(), which serializes
+    the whole DOM to answer the same question.
+    """
+
+    def _session(self, events=("init", "DOMContentLoaded", "load")):
+        session = _startable_session("meta")
+        session.session_manager = _FakeSessionManager(
+            {"T1": ("https://example.com/app", "App")}, {"T1": events}
+        )
+        session.agent_focus_target_id = "T1"
+        session.get_browser_state_summary = AsyncMock(side_effect=AssertionError("full DOM snapshot"))
+        return session
+
+    def test_reads_url_title_and_target(self):
+        self.assertEqual(
+            _mod._page_metadata(self._session()),
+            {"target_id": "T1", "url": "https://example.com/app", "title": "App",
+             "load_state": "complete"},
+        )
+
+    def test_load_state_follows_the_latest_navigation(self):
+        cases = {
+            (): None,
+            ("init",): "loading",
+            ("init", "DOMContentLoaded"): "interactive",
+            ("init", "DOMContentLoaded", "load", "networkIdle"): "complete",
+            # A new navigation's init resets it: the old load no longer counts.
+            ("init", "DOMContentLoaded", "load", "init", "firstPaint"): "loading",
+        }
+        for events, expected in cases.items():
+            with self.subTest(events=events):
+                self.assertEqual(_mod._page_metadata(self._session(events))["load_state"], expected)
+
+    def test_none_without_a_focused_page(self):
+        session = self._session()
+        session.agent_focus_target_id = None
+        self.assertIsNone(_mod._page_metadata(session))
+        session.agent_focus_target_id = "gone"
+        self.assertIsNone(_mod._page_metadata(session))
+        session.session_manager = None
+        self.assertIsNone(_mod._page_metadata(session))
+
+    async def test_listing_reports_the_current_page(self):
+        server = _make_server()
+        session = self._session()
+        server.active_sessions["meta"] = {
+            "session": session, "created_at": time.time(), "last_activity": time.time(),
+            "url": "about:blank",  # What upstream recorded when it was tracked.
+        }
+        [entry] = json.loads(await server._list_sessions())
+        self.assertEqual(entry["current_url"], "https://example.com/app")
+        self.assertEqual(entry["title"], "App")
+        self.assertEqual(entry["load_state"], "complete")
+        self.assertEqual(entry["target_id"], "T1")
+
+        session.session_manager = None  # Browser gone: the last known page stays.
+        [entry] = json.loads(await server._list_sessions())
+        self.assertEqual(entry["current_url"], "https://example.com/app")
+        self.assertNotIn("title", entry)
+        self.assertEqual(
+            server.active_sessions["meta"]["url"], "about:blank",
+            "listing must not write into upstream's session records",
+        )
+
+    async def test_listing_without_sessions_passes_upstream_text_through(self):
+        server = _make_server()
+        server._page_urls["gone"] = "https://example.com/"
+        self.assertEqual(await server._list_sessions(), "No active browser sessions")
+        self.assertEqual(server._page_urls, {})
+
+    def test_lookup_costs_microseconds(self):
+        session = self._session(("init", "DOMContentLoaded", "load") + ("networkIdle",) * 40)
+        started = time.perf_counter()
+        for _ in range(10_000):
+            _mod._page_metadata(session)
+        per_call = (time.perf_counter() - started) / 10_000
+        print(f"\n_page_metadata: {per_call * 1e6:.1f}us per call", file=sys.stderr)
+        self.assertLess(per_call, 0.001)
+
+
+class _SnapshotBrowser:
+    """
+    A browser of tabs, each at a URL, with per-origin localStorage, per-tab
+    sessionStorage and per-origin IndexedDB names — enough CDP to export it
+    and to import into it. `no_robots` origins answer /robots.txt with an
+    error page. Every call waits `rtt`.
+    """
+
+    def __init__(self, tabs=(), local=None, idb=None, no_robots=(), unreachable=(), rtt=0.0):
+        from urllib.parse import urlsplit
+
+        self.local = {origin: dict(items) for origin, items in (local or {}).items()}
+        self.idb = idb or {}
+        self.cookies = [{"name": "sid", "value": "1", "domain": "a.test", "path": "/"}]
+        self.tabs = {}
+        self.calls = []
+        self._next = 0
+        browser = self
+
+        def origin_of(url):
+            parts = urlsplit(url)
+            return f"{parts.scheme}://{parts.netloc}" if parts.scheme.startswith("http") else "null"
+
+        class _Tab:
+            def __init__(self, target_id, url, session=None):
+                self.session_id = f"s-{target_id}"
+                self.target_id = target_id
+                self.url = url
+                self.session = dict(session or {})
+                self.cdp_client = MagicMock()
+                self.cdp_client.send = _Send(self)
+
+        class _Send:
+            def __init__(self, tab):
+                self._tab = tab
+
+            def __getattr__(self, domain):
+                tab = self._tab
+
+                class _Domain:
+                    def __getattr__(self, method):
+                        async def _call(params=None, session_id=None):
+                            return await browser._reply(tab, f"{domain}.{method}", params or {})
+                        return _call
+                return _Domain()
+
+        self._Tab = _Tab
+        self._origin_of = origin_of
+        self._no_robots = set(no_robots)
+        self._unreachable = set(unreachable)
+        self._rtt = rtt
+        for url, session in tabs:
+            self._add(url, session)
+        self.root = _Tab("root", "about:blank")
+
+    def _add(self, url, session=None):
+        self._next += 1
+        tab = self._Tab(f"T{self._next}", url, session)
+        self.tabs[tab.target_id] = tab
+        return tab
+
+    async def _reply(self, tab, path, params):
+        self.calls.append((tab.target_id, path, params))
+        await asyncio.sleep(self._rtt)
+        origin = self._origin_of(tab.url)
+        if path == "Storage.getCookies":
+            return {"cookies": list(self.cookies)}
+        if path == "Target.getTargets":
+            return {"targetInfos": [
+                {"targetId": t.target_id, "type": "page", "url": t.url} for t in self.tabs.values()
+            ]}
+        if path == "Target.createTarget":
+            new = self._add(params["url"])
+            return {"targetId": new.target_id}
+        if path == "Target.closeTarget":
+            self.tabs.pop(params["targetId"], None)
+            return {}
+        if path == "Page.navigate":
+            target = self._origin_of(params["url"])
+            if target in self._unreachable:
+                return {"errorText": "net::ERR_NAME_NOT_RESOLVED"}
+            if target in self._no_robots and params["url"].endswith("/robots.txt"):
+                tab.url = "chrome-error://chromewebdata/"
+            else:
+                tab.url = params["url"]
+            return {}
+        if path == "Storage.setCookies":
+            self.cookies.extend(params["cookies"])
+            return {}
+        expression = params["expression"]
+        if expression == "location.origin":
+            return {"result": {"value": origin}}
+        if expression == _mod._SNAPSHOT_COLLECT_JS:
+            return {"result": {"value": {
+                "origin": origin,
+                "localStorage": dict(self.local.get(origin, {})),
+                "sessionStorage": dict(tab.session),
+                "indexedDB": list(self.idb.get(origin, [])),
+            }}}
+        if expression.startswith(_mod._SNAPSHOT_RESTORE_JS):
+            items, name = json.loads("[" + expression[len(_mod._SNAPSHOT_RESTORE_JS) + 1:-1] + "]")
+            area = self.local.setdefault(origin, {}) if name == "localStorage" else tab.session
+            area.update(items)
+            return {"result": {"value": len(items)}}
+        raise AssertionError(f"unexpected CDP call {path} {params}")
+
+    def session(self, name="snap"):
+        """A BrowserSession stand-in over this browser; its own tab is the first."""
+        bs = _startable_session(name)
+        main = next(iter(self.tabs.values()), None) or self._add("about:blank")
+
+        async def get_cdp(target_id=None, focus=True):
+            return main if target_id is None else self.tabs[target_id]
+
+        browser = self
+
+        class _Manager(_FakeSessionManager):
+            """Targets are the browser's live tabs."""
+
+            def get_target(self, target_id):
+                tab = browser.tabs.get(target_id)
+                return tab and self._ns(target_id=target_id, url=tab.url, title="")
+
+            def get_all_page_targets(self):
+                return [self.get_target(target_id) for target_id in browser.tabs]
+
+        bs.get_or_create_cdp_session = get_cdp
+        bs.session_manager = _Manager()
+        bs.agent_focus_target_id = main.target_id
+        bs.get_browser_state_summary = AsyncMock(side_effect=AssertionError("full DOM snapshot"))
+        return bs
+
+
+class TestSessionSnapshots(unittest.IsolatedAsyncioTestCase):
+    """
+    v2 snapshots: gzip, cookies plus per-origin storage, written off-loop,
+    optionally as a delta; import reads either format and restores origins
+    in parallel.
+    """
+
+    def setUp(self):
+        import shutil
+        import tempfile
+
+        self.dir = Path(tempfile.mkdtemp(prefix="magus-snapshots-"))
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.server = _make_server()
+
+    def _browser(self, **kwargs):
+        kwargs.setdefault("tabs", [
+            ("https://a.test/app", {"tab": "1"}),
+            ("https://a.test/other", {"tab2": "2"}),
+            ("https://b.test/", {}),
+            ("about:blank", {}),
+        ])
+        kwargs.setdefault("local", {"https://a.test": {"token": "abc"}, "https://b.test": {"k": "v"}})
+        kwargs.setdefault("idb", {"https://a.test": ["cache", "keyval"]})
+        browser = _SnapshotBrowser(**kwargs)
+        self.server.active_sessions["snap"] = {"session": browser.session()}
+        return browser
+
+    async def _export(self, name, **args):
+        out = await self.server._handle_export_session(
+            {"session_id": "snap", "output_path": str(self.dir / name), **args}
+        )
+        return json.loads(out)
+
+    async def test_v2_is_gzip_with_every_open_origin(self):
+        import gzip
+
+        self._browser()
+        report = await self._export("s.json.gz")
+        raw = (self.dir / "s.json.gz").read_bytes()
+        data = json.loads(gzip.decompress(raw))
+
+        self.assertEqual(data["format"], "magus-session/2")
+        self.assertEqual(report["bytes"], len(raw))
+        self.assertEqual(sorted(data["origins"]), ["https://a.test", "https://b.test"])
+        self.assertEqual(
+            data["origins"]["https://a.test"],
+            {"localStorage": {"token": "abc"}, "sessionStorage": {"tab": "1", "tab2": "2"},
+             "indexedDB": ["cache", "keyval"]},
+        )
+        self.assertEqual(data["cookies"][0]["name"], "sid")
+        self.assertEqual(set(data["hashes"]), {"cookies", "https://a.test", "https://b.test"})
+        self.assertFalse(report["delta"])
+
+    async def test_v1_is_the_original_cookie_json(self):
+        self._browser()
+        await self._export("s.json", format="v1")
+        data = json.loads((self.dir / "s.json").read_text())
+        self.assertEqual(set(data), {"session_id", "exported_at", "url", "cookies"})
+
+    async def test_a_json_path_gets_v1_unless_v2_is_asked_for(self):
+        self._browser()
+        await self._export("plain.json")
+        data = json.loads((self.dir / "plain.json").read_text())
+        self.assertEqual(set(data), {"session_id", "exported_at", "url", "cookies"})
+
+        # v2 by request: still plain JSON, and still what a v1 reader reads.
+        report = await self._export("v2.json", format="v2")
+        data = json.loads((self.dir / "v2.json").read_text())
+        self.assertFalse(report["compressed"])
+        self.assertEqual(data["format"], "magus-session/2")
+        self.assertLessEqual({"session_id", "exported_at", "url", "cookies"}, set(data))
+
+        await self._export("d.json", delta=True)
+        self.assertTrue(json.loads((self.dir / "d.json").read_text())["base"])
+
+    async def test_snapshot_is_written_off_the_event_loop(self):
+        self._browser()
+        threads = []
+        real = _mod._write_snapshot
+
+        def spy(*args):
+            threads.append(threading.current_thread())
+            return real(*args)
+
+        with patch.object(_mod, "_write_snapshot", spy):
+            await self._export("s.json.gz")
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    async def test_delta_holds_only_what_changed_and_reads_back_whole(self):
+        import gzip
+
+        browser = self._browser()
+        await self._export("full.json.gz")
+        browser.local["https://b.test"]["k"] = "changed"
+        browser.tabs.pop("T1")  # Both a.test tabs closed: the origin is gone.
+        browser.tabs.pop("T2")
+        report = await self._export("d1.json.gz", delta=True)
+
+        raw = json.loads(gzip.decompress((self.dir / "d1.json.gz").read_bytes()))
+        self.assertTrue(report["delta"])
+        self.assertEqual(list(raw["origins"]), ["https://b.test"])
+        self.assertEqual(raw["removed_origins"], ["https://a.test"])
+        self.assertNotIn("cookies", raw)  # Unchanged jar: inherited from the base.
+        self.assertEqual(raw["base"], str((self.dir / "full.json.gz").resolve()))
+
+        whole = _mod._read_snapshot(self.dir / "d1.json.gz")
+        self.assertEqual(whole["origins"], {"https://b.test": {
+            "localStorage": {"k": "changed"}, "sessionStorage": {}, "indexedDB": []}})
+        self.assertEqual(whole["cookies"][0]["name"], "sid")
+
+    async def test_delta_of_a_delta_chains_back_to_the_full_snapshot(self):
+        browser = self._browser()
+        await self._export("full.json.gz")
+        browser.local["https://b.test"]["k"] = "2"
+        await self._export("d1.json.gz", delta=True)
+        browser.local["https://a.test"]["token"] = "xyz"
+        report = await self._export("d2.json.gz", delta=True)
+        self.assertEqual(report["origins_written"], 1)
+
+        whole = _mod._read_snapshot(self.dir / "d2.json.gz")
+        self.assertEqual(whole["origins"]["https://a.test"]["localStorage"], {"token": "xyz"})
+        self.assertEqual(whole["origins"]["https://b.test"]["localStorage"], {"k": "2"})
+
+    async def test_delta_refuses_a_base_that_changed(self):
+        browser = self._browser()
+        await self._export("full.json.gz")
+        await self._export("d1.json.gz", delta=True)
+        browser.local["https://b.test"]["k"] = "rewritten"
+        await self._export("full.json.gz", base_path=None)  # Overwrite the base.
+        with self.assertRaisesRegex(ValueError, "changed since this delta"):
+            _mod._read_snapshot(self.dir / "d1.json.gz")
+
+    async def test_delta_cannot_overwrite_its_own_base(self):
+        self._browser()
+        await self._export("full.json.gz")
+        out = await self.server._handle_export_session(
+            {"session_id": "snap", "output_path": str(self.dir / "full.json.gz"), "delta": True}
+        )
+        self.assertIn("cannot overwrite its own base", out)
+
+    async def test_delta_against_an_explicit_base(self):
+        self._browser()
+        await self._export("full.json.gz")
+        self.server._last_snapshots.clear()  # As after a server restart.
+        report = await self._export("d.json.gz", delta=True, base_path=str(self.dir / "full.json.gz"))
+        self.assertEqual(report["origins_written"], 0)
+        self.assertFalse(report["cookies_written"])
+
+    async def _import(self, browser, path, navigate_to=None, all_origins=True):
+        session = browser.session("imported")
+        self.server._browser_pool = MagicMock()
+        self.server._browser_pool.checkout.return_value = (session, Path("/tmp/slot"))
+        args = {"import_path": str(path), "restore_all_origins": all_origins}
+        if navigate_to:
+            args["navigate_to"] = navigate_to
+            session.event_bus.dispatch = MagicMock(side_effect=lambda event: asyncio.sleep(0))
+        return json.loads(await self.server._handle_import_session(args))
+
+    async def test_import_restores_every_origin_in_parallel(self):
+        self._browser()
+        await self._export("s.json.gz")
+        target = _SnapshotBrowser(tabs=[("about:blank", {})], no_robots={"https://b.test"}, rtt=0.01)
+        out = await self._import(target, self.dir / "s.json.gz", navigate_to="https://a.test/app")
+
+        self.assertEqual(out["origins_restored"], 2)
+        self.assertEqual(out["origins_failed"], [])
+        self.assertEqual(target.local, {"https://a.test": {"token": "abc"}, "https://b.test": {"k": "v"}})
+        # a.test is navigate_to's origin: restored in the session's own tab,
+        # sessionStorage included; b.test in a background tab, since closed.
+        main = target.tabs["T1"]
+        self.assertEqual(main.session, {"tab": "1", "tab2": "2"})
+        self.assertEqual(list(target.tabs), ["T1"])
+        # Both origins at once: b.test's tab was open while a.test was restored.
+        a_calls = [i for i, c in enumerate(target.calls) if c[0] == "T1"]
+        b_calls = [i for i, c in enumerate(target.calls) if c[0] == "T2"]
+        self.assertLess(min(b_calls), max(a_calls))
+
+    async def test_other_origins_are_not_visited_unless_asked(self):
+        self._browser()
+        await self._export("s.json.gz")
+        target = _SnapshotBrowser(tabs=[("about:blank", {})])
+        out = await self._import(target, self.dir / "s.json.gz", navigate_to="https://a.test/app",
+                                 all_origins=False)
+
+        self.assertEqual(out["origins_restored"], 1)
+        self.assertEqual(out["origins_skipped"], ["https://b.test"])
+        self.assertEqual(target.local, {"https://a.test": {"token": "abc"}})
+        visited = [params["url"] for _, path, params in target.calls if path == "Page.navigate"]
+        self.assertTrue(visited)
+        self.assertTrue(all(url.startswith("https://a.test/") for url in visited), visited)
+        self.assertNotIn("Target.createTarget", [path for _, path, _ in target.calls])
+
+    async def test_unreachable_origins_are_reported_not_fatal(self):
+        self._browser()
+        await self._export("s.json.gz")
+        target = _SnapshotBrowser(tabs=[("about:blank", {})], unreachable={"https://b.test"})
+        out = await self._import(target, self.dir / "s.json.gz")
+
+        self.assertIn("session_id", out)
+        self.assertEqual(out["origins_restored"], 1)
+        self.assertEqual(out["origins_failed"][0]["origin"], "https://b.test")
+        self.assertEqual(list(target.tabs), ["T1"])  # The failed tab was closed too.
+
+    async def test_import_still_reads_v1_files(self):
+        (self.dir / "v1.json").write_text(json.dumps(
+            {"session_id": "old", "url": "https://a.test", "cookies": [{"name": "x", "value": "1", "domain": "a.test"}]},
+            indent=2,
+        ))
+        target = _SnapshotBrowser(tabs=[("about:blank", {})])
+        out = await self._import(target, self.dir / "v1.json")
+        self.assertEqual(out["cookies_imported"], 1)
+        self.assertEqual(out["origins_restored"], 0)
+        self.assertEqual(target.cookies[-1]["name"], "x")
+
+
+class TestWarmBrowserPoolWiring(unittest.IsolatedAsyncioTestCase):
+    """The server's session-creating paths take a warm browser when one is ready."""
+
+    def setUp(self):
+        self.server = _make_server()
+        self.server._track_session = MagicMock()
+        self.warm = _startable_session("warm")
+        self.server._browser_pool = _mod._BrowserPool(1, MagicMock(), pid=4242)
+        self.server._browser_pool._idle.append((self.warm, Path("/tmp/slot-1")))
+        self.server._browser_pool.top_up = MagicMock()
+
+    async def test_pool_size_defaults_to_off(self):
+        with patch.dict(os.environ, {}, clear=False):
+            os.environ.pop("BROWSER_USE_POOL_SIZE", None)
+            self.assertEqual(_mod._pool_size_from_env(), 0)
+        with patch.dict(os.environ, {"BROWSER_USE_POOL_SIZE": "99"}):
+            self.assertEqual(_mod._pool_size_from_env(), _mod._MAX_POOL_SIZE)
+        with patch.dict(os.environ, {"BROWSER_USE_POOL_SIZE": "two"}):
+            self.assertEqual(_mod._pool_size_from_env(), 0)
+        with patch.dict(os.environ, {"BROWSER_USE_POOL_SIZE": "2", "BROWSER_USE_CLOUD": "1"}):
+            self.assertEqual(_mod._pool_size_from_env(), 0)
+
+    async def test_init_browser_session_uses_the_warm_browser(self):
+        cold = MagicMock(name="BrowserSession")
+        with (
+            _hermetic_chromium_cache(),
+            patch.object(_mod, "BrowserSession", cold),
+            patch.object(_mod, "get_default_profile", return_value={}),
+        ):
+            await self.server._init_browser_session()
+
+        self.assertIs(self.server.browser_session, self.warm)
+        cold.assert_not_called()
+        self.warm.start.assert_not_awaited()  # already started by the pool
+        self.assertEqual(self.server._browser_pool.hits, 1)
+        self.server._browser_pool.top_up.assert_called_once_with()
+
+    async def test_per_call_overrides_bypass_the_pool(self):
+        cold_session = _startable_session("cold")
+        with (
+            _hermetic_chromium_cache(),
+            patch.object(_mod, "BrowserProfile", MagicMock()),
+            patch.object(_mod, "BrowserSession", MagicMock(return_value=cold_session)),
+            patch.object(_mod, "get_default_profile", return_value={}),
+        ):
+            await self.server._init_browser_session(allowed_domains=["example.com"])
+
+        self.assertIs(self.server.browser_session, cold_session)
+        self.assertEqual(self.server._browser_pool.stats()["ready"], 1)
+
+    async def test_import_session_uses_the_warm_browser(self):
+        fake_cdp = _FakeCDPSession()
+        self.warm.get_or_create_cdp_session = AsyncMock(return_value=fake_cdp)
+        with _fake_home(create_profile_dir=False) as (home, _):
+            src = home / "session.json"
+            src.write_text(json.dumps({"cookies": [{"name": "a", "value": "1"}]}))
+            with patch.object(_mod, "BrowserSession", MagicMock()) as cold:
+                out = json.loads(await self.server._handle_import_session({"import_path": str(src)}))
+
+        cold.assert_not_called()
+        self.assertEqual(out["session_id"], "warm")
+        self.assertIn("warm", self.server.active_sessions)
+
+    async def test_a_pinned_profile_turns_the_pool_off_once(self):
+        stderr = io.StringIO()
+        with (
+            patch.dict(os.environ, {"BROWSER_USE_POOL_SIZE": "2"}),
+            patch.object(_mod, "get_default_profile", return_value={"user_data_dir": "/pinned"}),
+            contextlib.redirect_stderr(stderr),
+        ):
+            server = _make_server()
+            server._browser_pool.top_up()
+            self.assertIsNone(server._browser_pool.checkout())
+
+        self.assertEqual(server._browser_pool.stats()["size"], 0)
+        self.assertEqual(server._browser_pool.launch_failures, 0)
+        self.assertEqual(stderr.getvalue().count("is ignored"), 1)
+
+    async def test_handshake_notification_starts_filling(self):
+        server = _make_server()
+        server._browser_pool.top_up = MagicMock()
+        handler = server.server.notification_handlers[_mod.types.InitializedNotification]
+        await handler(MagicMock())
+        server._browser_pool.top_up.assert_called_once_with()
+
+    async def test_doctor_reports_pool_stats(self):
+        report = json.loads(await self.server._handle_doctor({}))
+        self.assertEqual(report["browser_pool"]["size"], 1)
+        self.assertIn("hits", report["browser_pool"])
+        self.assertIn("launch_seconds", report["browser_pool"])
+
+
+class TestWarmBrowserPoolCleanup(unittest.TestCase):
+    """Pool slots are PID-scoped like the main profile, and cleaned up like it."""
+
+    def test_shutdown_kills_idle_pooled_browsers_and_removes_their_slots(self):
+        server = _make_server()
+        proc = _FakeChromeProcess(pid=424250, lifetime=0.0)
+        pooled = _session_with_browser_tree(proc)
+        with _fake_home() as (_, profile_dir):
+            slot_dir = profile_dir.parent / f"{profile_dir.name}-1"
+            slot_dir.mkdir()
+            server._browser_pool = _mod._BrowserPool(1, MagicMock())
+            server._browser_pool._idle.append((pooled, slot_dir))
+
+            server._shutdown_sync()
+            results = (profile_dir.exists(), slot_dir.exists())
+
+        self.assertTrue(proc.terminated, "an unused warm browser must still be killed")
+        self.assertEqual(results, (False, False))
+
+    def test_release_keeps_slots_the_pool_still_holds(self):
+        server = _make_server()
+        with _fake_home() as (_, profile_dir):
+            held = profile_dir.parent / f"{profile_dir.name}-1"
+            freed = profile_dir.parent / f"{profile_dir.name}-2"
+            held.mkdir()
+            freed.mkdir()
+            server._browser_pool = _mod._BrowserPool(1, MagicMock())
+            server._browser_pool._idle.append((_startable_session(), held))
+            server._browser_pool._next_slot = 3
+
+            asyncio.run(server._release_profile_dir_if_idle())
+            results = (profile_dir.exists(), held.exists(), freed.exists())
+
+        self.assertEqual(
+            results,
+            (False, True, False),
+            "the closed session's slot goes; the warm browser's slot must stay",
+        )
+
+    def test_reaper_sweeps_a_dead_servers_pool_slots_only(self):
+        import psutil
+
+        dead_pid = TestReapOrphanedProfiles._find_dead_pid()
+        with _fake_home(create_profile_dir=False) as (home, _):
+            profiles = home / ".config" / "browseruse" / "profiles"
+            dead_slot = profiles / f"{_NEW_SESSION_PREFIX}{dead_pid}-1"
+            live_slot = profiles / f"{_NEW_SESSION_PREFIX}{os.getpid()}-1"
+            odd_slot = profiles / f"{_NEW_SESSION_PREFIX}{dead_pid}-x"
+            for directory in (dead_slot, live_slot, odd_slot):
+                directory.mkdir(parents=True)
+
+            with (
+                patch.object(psutil, "process_iter", return_value=[]),
+                contextlib.redirect_stderr(io.StringIO()),
+            ):
+                _mod._reap_orphaned_profiles(profiles)
+            results = (dead_slot.exists(), live_slot.exists(), odd_slot.exists())
+
+        self.assertEqual(results, (False, True, True))
+
+    def test_release_spares_slots_allocated_after_the_snapshot(self):
+        """A slot numbered past the snapshot may be mid-launch; it is not ours to free."""
+        server = _make_server()
+        with _fake_home() as (_, profile_dir):
+            launching = profile_dir.parent / f"{profile_dir.name}-1"
+            launching.mkdir()
+            server._browser_pool = _mod._BrowserPool(1, MagicMock())
+
+            asyncio.run(server._release_profile_dir_if_idle())
+            results = (profile_dir.exists(), launching.exists())
+
+        self.assertEqual(results, (False, True))
+
+
+# ---------------------------------------------------------------------------
+# Filesystem and process-table work stays off the event loop
+# ---------------------------------------------------------------------------
+
+class TestMaintenanceExecutor(unittest.TestCase):
+    """
+    Profile removal and the orphan reaper used to run on the event loop, so a
+    50MB rmtree or a full process-table scan stalled every concurrent tool call.
+    """
+
+    def test_release_deletes_on_the_maintenance_thread(self):
+        server = _make_server()
+        threads: list[str] = []
+        real_remove = _mod._release_profile_dir
+
+        def recording_remove(profile_dir, timeout):
+            threads.append(threading.current_thread().name)
+            return real_remove(profile_dir, timeout)
+
+        with (
+            _fake_home() as (_, profile_dir),
+            patch.object(_mod, "_release_profile_dir", side_effect=recording_remove),
+        ):
+            asyncio.run(server._release_profile_dir_if_idle())
+            removed = not profile_dir.exists()
+
+        self.assertTrue(removed)
+        self.assertTrue(threads)
+        self.assertTrue(all(name.startswith("profile-maintenance") for name in threads), threads)
+
+    def test_cleanup_cycle_reaps_off_the_loop(self):
+        server = _make_server()
+        threads: list[str] = []
+        reaper = MagicMock(side_effect=lambda: threads.append(threading.current_thread().name))
+
+        with patch.object(_mod, "_reap_orphaned_profiles", reaper):
+            asyncio.run(server._cleanup_expired_sessions())
+
+        self.assertEqual(len(threads), 1)
+        self.assertTrue(threads[0].startswith("profile-maintenance"), threads)
+
+    def test_loop_keeps_serving_while_a_release_is_slow(self):
+        server = _make_server()
+        release_started = threading.Event()
+        finish_release = threading.Event()
+
+        def slow_remove(profile_dir, timeout):
+            release_started.set()
+            finish_release.wait(5)
+            return True
+
+        async def scenario():
+            release = asyncio.ensure_future(server._release_profile_dir_if_idle())
+            await asyncio.to_thread(release_started.wait, 5)
+            ticks = 0
+            for _ in range(5):
+                await asyncio.sleep(0)
+                ticks += 1
+            finish_release.set()
+            await release
+            return ticks
+
+        with (
+            _fake_home(),
+            patch.object(_mod, "_release_profile_dir", side_effect=slow_remove),
+        ):
+            ticks = asyncio.run(scenario())
+
+        self.assertEqual(ticks, 5)
+
+    def test_launch_waits_for_a_pending_release(self):
+        server = _make_server()
+        order: list[str] = []
+        finish_release = threading.Event()
+
+        def slow_remove(profile_dir, timeout):
+            finish_release.wait(5)
+            order.append("released")
+            return True
+
+        async def scenario():
+            release = asyncio.ensure_future(server._release_profile_dir_if_idle())
+            await asyncio.sleep(0)
+            waiter = asyncio.ensure_future(server._await_profile_release())
+            await asyncio.sleep(0.05)
+            self.assertFalse(waiter.done(), "the launch must not start mid-delete")
+            finish_release.set()
+            await waiter
+            order.append("launched")
+            await release
+
+        with (
+            _fake_home(),
+            patch.object(_mod, "_release_profile_dir", side_effect=slow_remove),
+        ):
+            asyncio.run(scenario())
+
+        self.assertEqual(order, ["released", "launched"])
+        self.assertIsNone(server._profile_release)
+
+    def test_delete_tree_removes_a_nested_profile(self):
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp) / "profile"
+            for sub in ("Default/Cache", "Default/IndexedDB/x", "ShaderCache/GPU"):
+                (root / sub).mkdir(parents=True)
+                for i in range(5):
+                    (root / sub / f"f{i}").write_bytes(b"x" * 64)
+            (root / "Local State").write_text("{}")
+
+            _mod._delete_tree(root)
+
+            self.assertFalse(root.exists())
+
+    def test_delete_tree_does_not_follow_symlinks(self):
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as tmp:
+            outside = Path(tmp) / "outside"
+            (outside / "keep").mkdir(parents=True)
+            (outside / "keep" / "file").write_text("precious")
+            root = Path(tmp) / "profile"
+            (root / "Default").mkdir(parents=True)
+            (root / "Default" / "link").symlink_to(outside / "keep")
+            (root / "top-link").symlink_to(outside)
+
+            _mod._delete_tree(root)
+
+            self.assertFalse(root.exists())
+            self.assertEqual((outside / "keep" / "file").read_text(), "precious")
+
+
+# ---------------------------------------------------------------------------
+# Released profiles are renamed into a graveyard and collected later
+# ---------------------------------------------------------------------------
+
+class TestProfileGraveyard(unittest.TestCase):
+    """
+    Releasing a profile used to mean an rmtree retry loop on the shutdown and
+    close paths. It is now one rename into profiles/.graveyard; the reaper's
+    sweep deletes from there, throttled, one server at a time.
+    """
+
+    def _profiles(self) -> Path:
+        import shutil
+        import tempfile
+
+        tmp = Path(tempfile.mkdtemp(prefix="magus-graveyard-"))
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        return tmp
+
+    @staticmethod
+    def _fill(directory: Path, files: int = 5) -> None:
+        for sub in ("Default/Cache", "Default/Network"):
+            (directory / sub).mkdir(parents=True)
+            for i in range(files):
+                (directory / sub / f"f{i}").write_bytes(b"x" * 128)
+
+    def test_release_is_a_rename_into_the_graveyard(self):
+        profiles = self._profiles()
+        profile_dir = profiles / f"{_NEW_SESSION_PREFIX}{os.getpid()}"
+        self._fill(profile_dir)
+        inode = profile_dir.stat().st_ino
+
+        self.assertTrue(_mod._release_profile_dir(profile_dir))
+
+        self.assertFalse(profile_dir.exists())
+        buried = list((profiles / ".graveyard").iterdir())
+        self.assertEqual([entry.stat().st_ino for entry in buried], [inode])
+        self.assertTrue(buried[0].name.startswith(profile_dir.name))
+
+    def test_a_refused_rename_falls_back_to_removal(self):
+        profiles = self._profiles()
+        profile_dir = profiles / f"{_NEW_SESSION_PREFIX}{os.getpid()}"
+        self._fill(profile_dir)
+
+        with patch.object(os, "rename", side_effect=PermissionError("in use")):
+            self.assertTrue(_mod._release_profile_dir(profile_dir, timeout=0.5))
+
+        self.assertFalse(profile_dir.exists())
+
+    def test_releasing_a_missing_directory_succeeds(self):
+        profiles = self._profiles()
+        self.assertTrue(_mod._release_profile_dir(profiles / "absent"))
+        self.assertTrue(_mod._release_profile_dir(profiles / "no" / "parent"))
+
+    def test_collector_empties_the_graveyard(self):
+        profiles = self._profiles()
+        for pid in (11, 12):
+            profile_dir = profiles / f"{_NEW_SESSION_PREFIX}{pid}"
+            self._fill(profile_dir)
+            _mod._bury_profile_dir(profile_dir)
+
+        finished = _mod._collect_graveyard(profiles, rate=0)
+
+        self.assertEqual(finished, 2)
+        self.assertEqual(
+            [p.name for p in (profiles / ".graveyard").iterdir() if not p.name.startswith(".")],
+            [],
+        )
+
+    def test_collector_is_throttled(self):
+        profiles = self._profiles()
+        profile_dir = profiles / "buried"
+        self._fill(profile_dir, files=10)
+        _mod._bury_profile_dir(profile_dir)
+        # 20 files + 5 dirs at a 4KiB minimum each, at 100 such units a second.
+        rate = 100 * _mod._GRAVEYARD_MIN_FILE_COST
+
+        started = time.monotonic()
+        finished = _mod._collect_graveyard(profiles, rate=rate)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(finished, 1)
+        self.assertGreater(elapsed, 0.2, "deleting flat out ignores the bandwidth cap")
+
+    def test_collector_stops_at_its_budget_and_resumes_later(self):
+        profiles = self._profiles()
+        profile_dir = profiles / "buried"
+        self._fill(profile_dir, files=20)
+        _mod._bury_profile_dir(profile_dir)
+
+        started = time.monotonic()
+        first = _mod._collect_graveyard(profiles, rate=_mod._GRAVEYARD_MIN_FILE_COST, budget=0.2)
+        elapsed = time.monotonic() - started
+        second = _mod._collect_graveyard(profiles, rate=0)
+
+        self.assertEqual(first, 0)
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(second, 1)
+
+    def test_only_one_server_collects_at_a_time(self):
+        import fcntl
+
+        profiles = self._profiles()
+        profile_dir = profiles / "buried"
+        self._fill(profile_dir)
+        _mod._bury_profile_dir(profile_dir)
+
+        holder = os.open(profiles / ".graveyard" / ".lock", os.O_RDWR | os.O_CREAT)
+        try:
+            fcntl.flock(holder, fcntl.LOCK_EX)
+            busy = _mod._collect_graveyard(profiles, rate=0)
+        finally:
+            os.close(holder)
+        free = _mod._collect_graveyard(profiles, rate=0)
+
+        self.assertEqual((busy, free), (0, 1))
+
+    def test_collector_does_not_follow_symlinks(self):
+        import shutil
+
+        profiles = self._profiles()
+        outside = profiles.parent / f"{profiles.name}-outside"
+        self.addCleanup(shutil.rmtree, outside, ignore_errors=True)
+        outside.mkdir()
+        (outside / "file").write_text("precious")
+        profile_dir = profiles / "buried"
+        profile_dir.mkdir()
+        (profile_dir / "link").symlink_to(outside)
+        _mod._bury_profile_dir(profile_dir)
+
+        self.assertEqual(_mod._collect_graveyard(profiles, rate=0), 1)
+        self.assertEqual((outside / "file").read_text(), "precious")
+
+    def test_reaper_buries_orphans_and_collects_them(self):
+        import psutil
+
+        profiles = self._profiles()
+        dead_pid = TestReapOrphanedProfiles._find_dead_pid()
+        dead_dir = profiles / f"{_NEW_SESSION_PREFIX}{dead_pid}"
+        self._fill(dead_dir)
+
+        with (
+            patch.object(psutil, "process_iter", return_value=[]),
+            contextlib.redirect_stderr(io.StringIO()),
+        ):
+            _mod._reap_orphaned_profiles(profiles)
+
+        self.assertFalse(dead_dir.exists())
+        leftovers = [p for p in (profiles / ".graveyard").iterdir() if not p.name.startswith(".")]
+        self.assertEqual(leftovers, [])
+
+    def test_shutdown_only_renames(self):
+        server = _make_server()
+        with (
+            _fake_home() as (_, profile_dir),
+            patch.object(_mod, "_remove_profile_dir", MagicMock()) as remove,
+        ):
+            self._fill(profile_dir)
+            server._shutdown_sync()
+            gone = not profile_dir.exists()
+            buried = [
+                p.name for p in (profile_dir.parent / ".graveyard").iterdir()
+                if not p.name.startswith(".")
+            ]
+
+        self.assertTrue(gone)
+        self.assertEqual(len(buried), 1)
+        remove.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# An ownership manifest spares the reaper the process-table scan
+# ---------------------------------------------------------------------------
+
+class TestProfileOwnershipManifest(unittest.TestCase):
+    """
+    The reaper ran psutil.process_iter over the whole machine for EVERY dead
+    profile, re-parsing every command line each time. With a manifest in the
+    profile it needs two PID lookups; without one, one shared scan per sweep.
+    """
+
+    def _profiles(self) -> Path:
+        import shutil
+        import tempfile
+
+        tmp = Path(tempfile.mkdtemp(prefix="magus-manifest-"))
+        self.addCleanup(shutil.rmtree, tmp, ignore_errors=True)
+        return tmp
+
+    def _sleeper(self):
+        child, proc = _spawn_sleeper()
+        self.addCleanup(child.wait)
+        self.addCleanup(child.kill)
+        return child, proc
+
+    @staticmethod
+    def _manifest(entry: Path, server: dict, browser: dict | None) -> None:
+        entry.mkdir(parents=True, exist_ok=True)
+        (entry / _mod._PROFILE_MANIFEST_NAME).write_text(
+            json.dumps({"server": server, "browser": browser})
+        )
+
+    def _reap(self, profiles: Path, process_iter=None):
+        import psutil
+
+        scan = MagicMock(return_value=process_iter or [])
+        with (
+            patch.object(psutil, "process_iter", scan),
+            contextlib.redirect_stderr(io.StringIO()),
+        ):
+            _mod._reap_orphaned_profiles(profiles)
+        return scan
+
+    def test_manifest_records_server_and_browser(self):
+        profiles = self._profiles()
+        _, browser = self._sleeper()
+        session = MagicMock(name="session")
+        session.browser_profile.user_data_dir = str(profiles / "p")
+        session._local_browser_watchdog._subprocess = browser
+        (profiles / "p").mkdir()
+
+        asyncio.run(_mod._record_profile_owner(session))
+
+        manifest = json.loads((profiles / "p" / _mod._PROFILE_MANIFEST_NAME).read_text())
+        self.assertEqual(manifest["server"]["pid"], os.getpid())
+        self.assertEqual(manifest["browser"]["pid"], browser.pid)
+        self.assertAlmostEqual(manifest["browser"]["create_time"], browser.create_time())
+
+    def test_a_launch_does_not_wait_behind_a_sweep(self):
+        import threading
+
+        profiles = self._profiles()
+        _, browser = self._sleeper()
+        session = MagicMock(name="session")
+        session.browser_profile.user_data_dir = str(profiles / "p")
+        session._local_browser_watchdog._subprocess = browser
+        (profiles / "p").mkdir()
+        sweep_done = threading.Event()
+        self.addCleanup(sweep_done.set)
+
+        async def launch_during_a_sweep():
+            sweep = asyncio.ensure_future(_mod._maintenance_executor.run(sweep_done.wait, 30))
+            await asyncio.sleep(0.05)
+            started = time.monotonic()
+            await asyncio.wait_for(_mod._record_profile_owner(session), timeout=5)
+            elapsed = time.monotonic() - started
+            sweep_done.set()
+            await sweep
+            return elapsed
+
+        self.assertLess(asyncio.run(launch_during_a_sweep()), 2)
+        self.assertTrue((profiles / "p" / _mod._PROFILE_MANIFEST_NAME).exists())
+
+    def test_no_manifest_without_a_profile_dir(self):
+        profiles = self._profiles()
+        _mod._write_profile_manifest(profiles / "never-launched", MagicMock())
+        self.assertFalse((profiles / "never-launched").exists())
+
+    def test_dead_owner_is_settled_without_a_scan(self):
+        profiles = self._profiles()
+        child, browser = self._sleeper()
+        dead_pid = TestReapOrphanedProfiles._find_dead_pid()
+        entry = profiles / f"{_NEW_SESSION_PREFIX}{dead_pid}"
+        self._manifest(
+            entry,
+            {"pid": dead_pid, "create_time": 1.0},
+            {"pid": browser.pid, "create_time": browser.create_time()},
+        )
+
+        scan = self._reap(profiles)
+
+        scan.assert_not_called()
+        self.assertFalse(entry.exists())
+        self.assertIsNotNone(child.wait(timeout=5), "the recorded browser must be killed")
+
+    def test_a_reused_browser_pid_is_not_killed(self):
+        profiles = self._profiles()
+        child, stranger = self._sleeper()
+        dead_pid = TestReapOrphanedProfiles._find_dead_pid()
+        entry = profiles / f"{_NEW_SESSION_PREFIX}{dead_pid}"
+        self._manifest(
+            entry,
+            {"pid": dead_pid, "create_time": 1.0},
+            {"pid": stranger.pid, "create_time": stranger.create_time() - 100},
+        )
+
+        self._reap(profiles)
+
+        self.assertFalse(entry.exists())
+        self.assertIsNone(child.poll(), "a process that merely shares the PID must live")
+
+    def test_a_reused_server_pid_does_not_keep_an_orphan(self):
+        profiles = self._profiles()
+        _, stranger = self._sleeper()
+        entry = profiles / f"{_NEW_SESSION_PREFIX}{stranger.pid}"
+        self._manifest(entry, {"pid": stranger.pid, "create_time": stranger.create_time() - 100}, None)
+
+        self._reap(profiles)
+
+        self.assertFalse(entry.exists(), "pid_exists alone would keep this forever")
+
+    def test_live_owner_is_left_alone(self):
+        profiles = self._profiles()
+        _, server = self._sleeper()
+        entry = profiles / f"{_NEW_SESSION_PREFIX}{server.pid}"
+        self._manifest(entry, _mod._process_identity(server), None)
+
+        scan = self._reap(profiles)
+
+        scan.assert_not_called()
+        self.assertTrue(entry.exists())
+
+    def test_a_manifest_for_another_pid_is_ignored(self):
+        profiles = self._profiles()
+        _, server = self._sleeper()
+        entry = profiles / f"{_NEW_SESSION_PREFIX}{server.pid}"
+        # Claims a dead owner, but the name says otherwise: trust pid_exists.
+        self._manifest(entry, {"pid": server.pid + 1, "create_time": 1.0}, None)
+
+        self._reap(profiles)
+
+        self.assertTrue(entry.exists())
+
+    def test_unrecorded_profiles_share_one_scan(self):
+        profiles = self._profiles()
+        dead_pid = TestReapOrphanedProfiles._find_dead_pid()
+        entries = [
+            profiles / f"{_NEW_SESSION_PREFIX}{dead_pid}",
+            profiles / f"{_NEW_SESSION_PREFIX}{dead_pid}-1",
+            profiles / f"{_OLD_SESSION_PREFIX}{dead_pid}",
+        ]
+        chromes = []
+        for entry in entries:
+            entry.mkdir()
+            chrome = _reapable_process(entry.name)
+            chrome.info = {"pid": None, "cmdline": ["chrome", f"--user-data-dir={entry}"]}
+            chromes.append(chrome)
+
+        scan = self._reap(profiles, process_iter=chromes)
+
+        self.assertEqual(scan.call_count, 1)
+        for chrome in chromes:
+            chrome.terminate.assert_called_once()
+        self.assertFalse(any(entry.exists() for entry in entries))
+
+    def test_orphan_browsers_are_killed_concurrently(self):
+        profiles = self._profiles()
+        dead_pid = TestReapOrphanedProfiles._find_dead_pid()
+        chromes = []
+        for slot in range(1, 5):
+            entry = profiles / f"{_NEW_SESSION_PREFIX}{dead_pid}-{slot}"
+            entry.mkdir()
+            chrome = MagicMock(name=entry.name)
+            chrome.info = {"pid": None, "cmdline": [f"--user-data-dir={entry}"]}
+            dies_at: list = []
+            chrome.terminate.side_effect = lambda d=dies_at: d.append(time.monotonic() + 0.3)
+            chrome.is_running.side_effect = lambda d=dies_at: not d or time.monotonic() < d[0]
+            chromes.append(chrome)
+
+        started = time.monotonic()
+        self._reap(profiles, process_iter=chromes)
+        elapsed = time.monotonic() - started
+
+        self.assertLess(elapsed, 0.9, "four 0.3s exits one after another take 1.2s")
+        for chrome in chromes:
+            chrome.kill.assert_not_called()
+
+
+# ---------------------------------------------------------------------------
+# Test 16: browser_use is imported on the first tool call, not at startup
+# ---------------------------------------------------------------------------
+
+def _stub_mcp_server(*args, **kwargs):
+    """What mcp.server.Server(...) returns in these tests: the stub base's mock."""
+    return _StubBrowserUseServer().server
+
+
+class TestDeferredBrowserUseImport(unittest.TestCase):
+    """
+    Importing browser_use costs ~1.5s and used to run before `initialize` was
+    answered. With a current tool catalog, main() must serve the handshake
+    without it; the first tools/call builds the real server exactly once.
+    """
+
+    def test_main_serves_a_current_catalog_without_importing_browser_use(self):
+        loader = MagicMock()
+        with (
+            patch.object(_mod, "_read_tool_catalog", return_value=([], "9.9.9")),
+            patch.object(_mod, "_load_browser_use", loader),
+            patch.object(_mod, "Server", side_effect=_stub_mcp_server),
+            patch.object(_mod, "_reap_orphaned_profiles", MagicMock()),
+            patch.object(
+                _mod.mcp.server.stdio,
+                "stdio_server",
+                MagicMock(return_value=_FakeStdioServer()),
+            ),
+        ):
+            asyncio.run(_mod.main())
+
+        loader.assert_not_called()
+
+    def test_catalog_miss_imports_eagerly_and_writes_the_catalog(self):
+        writer = MagicMock()
+        with (
+            patch.object(_mod, "_read_tool_catalog", return_value=None),
+            patch.object(_mod, "_write_tool_catalog", writer),
+            patch.object(_mod, "_reap_orphaned_profiles", MagicMock()),
+            patch.object(_mod, "_install_shutdown_handlers", MagicMock()),
+            patch.object(
+                _mod.mcp.server.stdio,
+                "stdio_server",
+                MagicMock(return_value=_FakeStdioServer()),
+            ),
+        ):
+            asyncio.run(_mod.main())
+
+        writer.assert_called_once()
+        tools, version = writer.call_args.args
+        self.assertIn("browser_doctor", {tool.name for tool in tools})
+        self.assertEqual(version, "0.0.0-test")
+
+    def test_concurrent_first_calls_build_one_backend(self):
+        backends: list = []
+        server_class = _mod.MagusBrowserServer
+
+        def build():
+            backend = server_class()
+            backend.server.request_handlers[_mod.types.CallToolRequest] = AsyncMock(
+                return_value="result"
+            )
+            backends.append(backend)
+            return backend
+
+        async def scenario(front):
+            return await asyncio.gather(
+                front._handle_call_tool("first"), front._handle_call_tool("second")
+            )
+
+        with (
+            patch.object(_mod, "Server", side_effect=_stub_mcp_server),
+            patch.object(_mod, "MagusBrowserServer", side_effect=build),
+            patch.object(_mod, "_install_shutdown_handlers", MagicMock()) as install,
+        ):
+            front = _mod._LazyBrowserServer([], "9.9.9")
+            results = asyncio.run(scenario(front))
+
+        self.assertEqual(results, ["result", "result"])
+        self.assertEqual(len(backends), 1, "the backend must be built once, not per call")
+        install.assert_called_once_with(backends[0])
+        self.assertEqual(backends[0].cleanup_task_starts, 1)
+
+    def test_idle_maintenance_reaps_until_the_backend_exists(self):
+        async def scenario(front):
+            front.start_maintenance()
+            await asyncio.sleep(0.05)
+            front._backend = object()
+            await asyncio.wait_for(front._maintenance_task, 1)
+
+        with (
+            patch.object(_mod, "Server", side_effect=_stub_mcp_server),
+            patch.object(_mod, "_IDLE_MAINTENANCE_INTERVAL", 0.01),
+            patch.object(_mod, "_reap_orphaned_profiles", MagicMock()) as reap,
+            patch.object(_mod, "_exit_process", MagicMock()) as exit_process,
+        ):
+            asyncio.run(scenario(_mod._LazyBrowserServer([], "9.9.9")))
+
+        self.assertGreaterEqual(reap.call_count, 1)
+        exit_process.assert_not_called()
+
+
 # ---------------------------------------------------------------------------
 # Entry point
 # ---------------------------------------------------------------------------